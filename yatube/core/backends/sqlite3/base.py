@@ -0,0 +1,37 @@
+"""SQLite с режимом транзакций из ``OPTIONS['transaction_mode']``.
+
+Django до 5.1 открывает транзакцию ``atomic()`` простым ``BEGIN``:
+блокировка записи берётся только на первом изменении. Если в той же
+транзакции сначала было чтение, как в ``get_or_create``, а другой
+писатель успел закоммитить, SQLite сразу отвечает «database is locked»
+без ожидания ``busy_timeout``. ``BEGIN IMMEDIATE`` берёт блокировку в
+начале транзакции, и конкурирующие писатели честно ждут друг друга.
+Опция повторяет ``transaction_mode`` из Django 5.1.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из '
+                f'{", ".join(TRANSACTION_MODES)}: {mode!r}'
+            )
+        self.transaction_mode = mode and mode.upper()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('transaction_mode', None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,27 @@
+"""Настройка соединений SQLite при их открытии.
+
+WAL даёт читателям работать параллельно с единственным писателем, а
+``busy_timeout`` заставляет писателя подождать блокировку вместо ошибки
+«database is locked». ``synchronous=NORMAL`` в режиме WAL сохраняет
+целостность базы, рискуя лишь последними транзакциями при отключении
+питания. Значения задаёт ``settings.SQLITE_PRAGMAS``; WAL и
+``synchronous`` (``SQLITE_WAL_PRAGMAS``) добавляются только при
+``YATUBE_SQLITE_WAL=1``, потому что режим журнала сохраняется в файле
+базы и иначе навсегда переключил бы db.sqlite3 из репозитория.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
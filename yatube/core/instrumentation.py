@@ -0,0 +1,221 @@
+"""Замеры запросов без django-debug-toolbar.
+
+``RequestMetricsMiddleware`` на время запроса оборачивает соединения с
+базой в ``execute_wrapper`` и считает SQL-запросы и их время. Время
+рендера шаблонов считает бэкенд ``InstrumentedTemplates``, обращения к
+кешу — ``InstrumentedFileBasedCache``. Итог уходит в заголовок
+``Server-Timing``, а запросы дольше ``SLOW_REQUEST_MS`` пишутся в лог
+``yatube.slow_requests`` одной JSON-строкой с самыми долгими и
+повторяющимися SQL.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('yatube.slow_requests')
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = []
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, total_ms):
+        return ', '.join([
+            f'db;dur={self.db_ms:.1f};desc="{len(self.queries)} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} '
+            f'misses"',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+    def report(self, request, response, total_ms):
+        limit = settings.SLOW_REQUEST_SQL_LIMIT
+        slowest = sorted(self.queries, key=lambda query: -query[1])[:limit]
+        repeated = Counter(sql for sql, _ in self.queries).most_common(limit)
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_queries': len(self.queries),
+            'db_ms': round(self.db_ms, 1),
+            'template_ms': round(self.template_ms, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'slowest_sql': [
+                {'sql': sql, 'ms': round(ms, 1)} for sql, ms in slowest
+            ],
+            'repeated_sql': [
+                {'sql': sql, 'count': count}
+                for sql, count in repeated if count > 1
+            ],
+        }
+
+
+def current():
+    """Замеры текущего запроса или ``None`` вне запроса."""
+    return getattr(_state, 'metrics', None)
+
+
+def _record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current()
+        if metrics is not None:
+            elapsed = (time.perf_counter() - started) * 1000
+            metrics.queries.append((sql, elapsed))
+            metrics.db_ms += elapsed
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _state.metrics = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _state.metrics = None
+        total_ms = (time.perf_counter() - started) * 1000
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = metrics.server_timing(total_ms)
+        if total_ms >= settings.SLOW_REQUEST_MS:
+            logger.warning(json.dumps(
+                metrics.report(request, response, total_ms),
+                ensure_ascii=False,
+            ))
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = current()
+            if metrics is not None:
+                metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи ``get``/``get_many`` кеша.
+
+    Подмешивается к любому бэкенду кеша; ``get_many`` многих бэкендов
+    вызывает ``get`` по ключу, поэтому вложенные вызовы не считаются.
+    """
+
+    _missing = object()
+
+    def _count(self, hits, misses):
+        metrics = current()
+        if metrics is not None and not getattr(_state, 'in_get_many', False):
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            self._count(0, 1)
+            return default
+        self._count(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        _state.in_get_many = True
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            _state.in_get_many = False
+        self._count(len(values), len(keys) - len(values))
+        return values
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    def incr(self, key, delta=1, version=None):
+        """Приращение под блокировкой файла, без сброса срока жизни.
+
+        ``BaseCache.incr`` делает ``get`` и ``set``: параллельные
+        приращения теряются, а запись получает таймаут по умолчанию.
+        Здесь значение переписывается на месте, как в ``touch``.
+        """
+        try:
+            with open(self._key_to_file(key, version), 'r+b') as f:
+                locks.lock(f, locks.LOCK_EX)
+                try:
+                    value = self._incr_locked(f, delta)
+                finally:
+                    locks.unlock(f)
+        except FileNotFoundError:
+            value = None
+        if value is None:
+            raise ValueError("Key '%s' not found" % key)
+        return value
+
+    def _incr_locked(self, f, delta):
+        try:
+            expiry = pickle.load(f)
+        except EOFError:
+            return None
+        if expiry is not None and expiry < time.time():
+            return None
+        value = pickle.loads(zlib.decompress(f.read())) + delta
+        f.seek(0)
+        f.write(pickle.dumps(expiry, self.pickle_protocol))
+        f.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+        f.truncate()
+        return value
+
+
+def isolated_caches(location):
+    """``CACHES`` с файловым кешем каждого алиаса внутри ``location``.
+
+    Для прогонов, которые очищают кеш: тестов и бенчмарков.
+    """
+    return {
+        alias: {
+            'BACKEND': 'core.instrumentation.InstrumentedFileBasedCache',
+            'LOCATION': os.path.join(location, alias),
+            'OPTIONS': config.get('OPTIONS', {}),
+        }
+        for alias, config in settings.CACHES.items()
+    }
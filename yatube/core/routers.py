@@ -0,0 +1,125 @@
+"""Чтение с реплик базы данных.
+
+Записи всегда идут в ``default``. Чтения идут туда же, кроме
+представлений под ``replica_reads``: их запросы читают случайную
+реплику из ``settings.DATABASE_REPLICAS``. Реплики отстают от основной
+базы, поэтому после записи ``ReplicaPinningMiddleware`` ставит cookie, и
+``REPLICA_PIN_SECONDS`` секунд пользователь читает только основную базу
+и видит свои изменения. Сессии всегда читаются из основной базы.
+
+Кеши по версиям ``feed_cache`` учитывают, откуда прочитаны данные:
+версия после записи растёт сразу, а реплика ещё отдаёт старые строки.
+Поэтому запрос читает одну реплику и только ту, что отметила свою
+синхронизацию (``mark_synced``), а ``read_stamp`` — её имя и время
+синхронизации — входит в ключи кеша. Страница, собранная по отставшей
+реплике, не попадёт ни к читающим основную базу, ни к читателям реплики
+после следующей синхронизации.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_until'
+PRIMARY_ONLY_APPS = {'sessions'}
+SYNC_KEY = 'replica_synced:{}'
+
+_state = threading.local()
+
+
+def is_pinned(request):
+    try:
+        until = float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def mark_synced(alias):
+    """Отметить, что реплика ``alias`` только что догнала основную базу."""
+    cache.set(SYNC_KEY.format(alias), int(time.time() * 1000), None)
+
+
+def _choose_replica(request):
+    """Реплика для запроса и время её синхронизации или ``None``."""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or is_pinned(request):
+        return None
+    alias = random.choice(replicas)
+    synced = cache.get(SYNC_KEY.format(alias))
+    if synced is None:
+        # Неизвестно, насколько реплика отстаёт: ключ кеша не построить.
+        return None
+    return alias, synced
+
+
+def read_stamp():
+    """Откуда читает текущий запрос — для ключей кеша.
+
+    Пустая строка для основной базы, иначе имя реплики и время её
+    последней синхронизации.
+    """
+    replica = getattr(_state, 'replica', None)
+    if replica is None:
+        return ''
+    return '{}@{}'.format(*replica)
+
+
+def replica_reads(view):
+    """Читать запросы представления с реплики, если пользователь не
+    записывал только что."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        previous = getattr(_state, 'replica', None)
+        _state.replica = _choose_replica(request)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = previous
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if (
+            replica is not None
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+        ):
+            return replica[0]
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Закрепить пользователя за основной базой после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        response = self.get_response(request)
+        if _state.wrote and settings.DATABASE_REPLICAS:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True,
+            )
+        return response
@@ -0,0 +1,28 @@
+"""Запуск тестов с собственным кешем.
+
+Тесты очищают кеш (``cache.clear()``), а общий файловый кеш проекта
+лежит в BASE_DIR/cache и нужен запущенному dev-серверу. Поэтому на время
+тестов ``CACHES`` указывает на временный каталог.
+"""
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from .instrumentation import isolated_caches
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-test-cache-')
+        self.cache_settings = override_settings(
+            CACHES=isolated_caches(self.cache_dir)
+        )
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
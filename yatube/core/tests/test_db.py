@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, override_settings
+
+
+@skipUnless(connection.vendor == 'sqlite', 'PRAGMA — SQLite')
+class SQLitePragmasTest(SimpleTestCase):
+    def open(self, path, **options):
+        settings_dict = dict(
+            connections.databases['default'], NAME=path, OPTIONS=options
+        )
+        wrapper = connections['default'].__class__(
+            settings_dict, alias='pragmas'
+        )
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        'journal_mode': 'wal', 'synchronous': 'normal',
+        'busy_timeout': 1234, 'cache_size': -2000,
+    })
+    def test_new_connection_is_configured(self):
+        """Новое соединение получает WAL и остальные настройки."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open(os.path.join(directory, 'db.sqlite3'))
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+            self.assertEqual(self.pragma(wrapper, 'cache_size'), -2000)
+            wrapper.close()
+
+    def test_transaction_takes_write_lock(self):
+        """BEGIN IMMEDIATE: блокировка записи берётся сразу."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db.sqlite3')
+            wrapper = self.open(path, transaction_mode='immediate')
+            wrapper.set_autocommit(
+                False, force_begin_transaction_with_broken_autocommit=True
+            )
+            other = sqlite3.connect(path, timeout=0, isolation_level=None)
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+            other.close()
+            wrapper.rollback()
+            wrapper.close()
+
+    def test_unknown_transaction_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.open(':memory:', transaction_mode='LATER')
+
+    def test_benchmark_runs(self):
+        """sqlite_benchmark сравнивает оба профиля."""
+        out = StringIO()
+        call_command(
+            'sqlite_benchmark', writers=2, followers=1, readers=1,
+            seconds=0.2, posts=10, stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['default', 'tuned'])
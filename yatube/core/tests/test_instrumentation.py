@@ -0,0 +1,102 @@
+import json
+import os
+import pickle
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def timing(self, response):
+        return dict(
+            part.split(';', 1)
+            for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        """Ответ несёт число запросов, время БД, шаблонов и кеш."""
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {'db', 'tpl', 'cache', 'total'})
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing['tpl'], r'^dur=\d+\.\d$')
+        self.assertRegex(timing['cache'], r'desc="\d+ hits [1-9]\d* misses"')
+
+    def test_page_cache_hit_counted(self):
+        """Повторный анонимный запрос отдаётся из кеша без SQL к ленте."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'"[1-9]\d* hits')
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SQL_LIMIT=2)
+    def test_slow_request_logged(self):
+        """Медленный запрос пишется в лог JSON-строкой с SQL."""
+        self.client.force_login(self.author)
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        report = json.loads(logs.records[0].getMessage())
+        self.assertEqual(report['path'], reverse('posts:index'))
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['db_queries'], 0)
+        self.assertLessEqual(len(report['slowest_sql']), 2)
+        self.assertIn('SELECT', report['slowest_sql'][0]['sql'])
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class FileBasedCacheIncrTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def expiry(self, key):
+        with open(cache._key_to_file(key), 'rb') as f:
+            return pickle.load(f)
+
+    def test_incr_keeps_expiry(self):
+        cache.set('counter', 1, None)
+        self.assertEqual(cache.incr('counter', 5), 6)
+        self.assertEqual(cache.get('counter'), 6)
+        self.assertIsNone(self.expiry('counter'))
+        cache.set('timed', 1, 1000)
+        expiry = self.expiry('timed')
+        cache.incr('timed')
+        self.assertEqual(self.expiry('timed'), expiry)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('expired', 1, -1)
+        with self.assertRaises(ValueError):
+            cache.incr('expired')
+
+
+class TestCacheIsolationTest(TestCase):
+    def test_tests_use_own_cache(self):
+        """Тесты очищают свой кеш, а не кеш dev-сервера."""
+        project_cache = os.path.join(settings.BASE_DIR, 'cache')
+        self.assertNotEqual(
+            os.path.dirname(cache._key_to_file('key')), project_cache
+        )
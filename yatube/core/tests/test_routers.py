@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.routers import (PIN_COOKIE, SYNC_KEY, PrimaryReplicaRouter,
+                          ReplicaPinningMiddleware, mark_synced, read_stamp,
+                          replica_reads)
+from posts.management.commands.sync_replicas import copy_database
+from posts.models import Post
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        mark_synced('replica1')
+
+    def tearDown(self):
+        cache.delete(SYNC_KEY.format('replica1'))
+
+    def read_alias(self, request, model=Post):
+        @replica_reads
+        def view(request):
+            return self.router.db_for_read(model)
+        return view(request)
+
+    def test_unsynced_replica_not_read(self):
+        """Реплику без отметки о синхронизации не читают."""
+        cache.delete(SYNC_KEY.format('replica1'))
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+
+    def test_read_stamp_names_replica_and_sync(self):
+        """Метка чтения меняется с каждой синхронизацией реплики."""
+        @replica_reads
+        def view(request):
+            return read_stamp()
+
+        request = self.factory.get('/')
+        first = view(request)
+        self.assertTrue(first.startswith('replica1@'))
+        cache.set(SYNC_KEY.format('replica1'), 1, None)
+        self.assertEqual(view(request), 'replica1@1')
+        self.assertEqual(read_stamp(), '')
+        request.COOKIES[PIN_COOKIE] = str(time.time() + 5)
+        self.assertEqual(view(request), '')
+
+    def test_marked_views_read_from_replica(self):
+        """Представления под replica_reads читают реплику, остальные — нет."""
+        request = self.factory.get('/')
+        self.assertEqual(self.read_alias(request), 'replica1')
+        self.assertEqual(self.read_alias(request, Session), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_pinned_user_reads_primary(self):
+        """После записи пользователь читает основную базу."""
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(time.time() + 5)
+        self.assertEqual(self.read_alias(request), 'default')
+        request.COOKIES[PIN_COOKIE] = str(time.time() - 5)
+        self.assertEqual(self.read_alias(request), 'replica1')
+
+    def test_middleware_pins_after_write(self):
+        """Cookie ставится только на ответ запроса, который писал в базу."""
+        def writing_view(request):
+            router.db_for_write(Post)
+            return HttpResponse()
+
+        def reading_view(request):
+            router.db_for_read(Post)
+            return HttpResponse()
+
+        request = self.factory.post('/')
+        response = ReplicaPinningMiddleware(writing_view)(request)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        response = ReplicaPinningMiddleware(reading_view)(request)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica1', 'posts'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+
+class CopyDatabaseTest(SimpleTestCase):
+    def test_replica_gets_primary_rows(self):
+        """Копировщик переносит в реплику текущее состояние базы."""
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, 'primary.sqlite3')
+            replica = os.path.join(directory, 'replica.sqlite3')
+            connection = sqlite3.connect(primary)
+            connection.execute('CREATE TABLE post (text TEXT)')
+            connection.execute("INSERT INTO post VALUES ('Пост')")
+            connection.commit()
+            connection.close()
+            copy_database(primary, replica)
+            connection = sqlite3.connect(replica)
+            rows = connection.execute('SELECT text FROM post').fetchall()
+            connection.close()
+        self.assertEqual(rows, [('Пост',)])
@@ -1,13 +1,107 @@
 from django.contrib import admin
-from .models import Post, Group
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.http import StreamingHttpResponse
 
+from . import export
+from .models import Comment, Follow, Post, Group
+from .paginators import EstimatedCountPaginator
 
-class PostAdmin(admin.ModelAdmin):
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete, подписывающий выбранное значение уже загруженным
+    объектом вместо запроса на каждую строку списка."""
+
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.preloaded is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for index, pk in enumerate(value, start=1):
+            obj = self.preloaded.get(str(pk))
+            if obj is not None:
+                label = self.choices.field.label_from_instance(obj)
+                options.append(
+                    self.create_option(name, pk, label, True, index)
+                )
+        return [(None, options, 0)]
+
+
+class ExportActionsMixin:
+    """Действия, отдающие выбранные объекты файлом JSON Lines или CSV.
+
+    Файл собирается потоком по мере чтения кусков таблицы, поэтому
+    выгрузка всех объектов не держит их в памяти.
+    """
+
+    actions = ('export_jsonl', 'export_csv')
+    export_dataset = None
+
+    def export_response(self, queryset, fmt):
+        _, fields = export.DATASETS[self.export_dataset]
+        response = StreamingHttpResponse(
+            export.export(queryset, fields, fmt),
+            content_type=CONTENT_TYPES[fmt],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.export_dataset}.{fmt}"'
+        )
+        return response
+
+    def export_jsonl(self, request, queryset):
+        return self.export_response(queryset, 'jsonl')
+
+    export_jsonl.short_description = 'Выгрузить в JSON Lines'
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+
+    export_csv.short_description = 'Выгрузить в CSV'
+
+
+class PostAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_dataset = 'posts'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        formset_class = super().get_changelist_formset(request, **kwargs)
+
+        class FormSet(formset_class):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                groups = {
+                    str(post.group_id): post.group
+                    for post in self.get_queryset() if post.group_id
+                }
+                for form in self.forms:
+                    widget = form.fields['group'].widget
+                    getattr(widget, 'widget', widget).preloaded = groups
+
+        return FormSet
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -16,5 +110,27 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class CommentAdmin(ExportActionsMixin, admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    raw_id_fields = ('author', 'post')
+    empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_dataset = 'comments'
+
+
+class FollowAdmin(ExportActionsMixin, admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_dataset = 'follows'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,166 @@
+"""Нагрузочные сценарии для представлений ленты и сравнение с базой.
+
+Каждый сценарий несколько раз запрашивает страницу тестовым клиентом
+через весь стек middleware с холодным кешем. Время меряется снаружи, а
+число SQL-запросов берётся из заголовка ``Server-Timing``
+(``core.instrumentation``). Кеш на время прогона свой, во временном
+каталоге: сценарии очищают его перед каждым запросом. Итог
+сравнивается с сохранённой базовой линией: больше запросов —
+регрессия; p95 медленнее допуска — тоже, если сравнение времени
+включено, ведь оно имеет смысл только на той же машине.
+"""
+import json
+import math
+import os
+import platform
+import random
+import re
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.instrumentation import isolated_caches
+
+from .models import Group, Post
+
+User = get_user_model()
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create',
+)
+
+
+def host():
+    """Машина, на которой сняты замеры."""
+    return {
+        'node': platform.node(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Scenarios:
+    def __init__(self, requests=30, seed=0, warmup=3):
+        self.requests = requests
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.post_ids = list(Post.objects.values_list('id', flat=True))
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.authors = list(User.objects.filter(
+            posts__isnull=False
+        ).distinct().values_list('username', flat=True))
+        reader = User.objects.filter(
+            follower__isnull=False
+        ).order_by('id').first() or User.objects.order_by('id').first()
+        self.client = Client()
+        self.client.force_login(reader)
+
+    def index(self):
+        return 'get', reverse('posts:index'), None
+
+    def group_posts(self):
+        slug = self.rng.choice(self.slugs)
+        return 'get', reverse('posts:group_list', args=[slug]), None
+
+    def profile(self):
+        username = self.rng.choice(self.authors)
+        return 'get', reverse('posts:profile', args=[username]), None
+
+    def post_detail(self):
+        post_id = self.rng.choice(self.post_ids)
+        return 'get', reverse('posts:post_detail', args=[post_id]), None
+
+    def follow_index(self):
+        return 'get', reverse('posts:follow_index'), None
+
+    def post_create(self):
+        text = f'Пост бенчмарка {self.rng.random()}'
+        return 'post', reverse('posts:post_create'), {'text': text}
+
+    def request(self, name):
+        """Один запрос сценария с пустым кешем: (мс, SQL-запросов)."""
+        method, url, data = getattr(self, name)()
+        cache.clear()
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, data)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {url} → {response.status_code}')
+        queries = QUERIES.search(response['Server-Timing']).group(1)
+        return elapsed, int(queries)
+
+    def measure(self, name):
+        # Первые запросы компилируют шаблоны и греют кеш SQLite.
+        for _ in range(self.warmup):
+            self.request(name)
+        samples = [self.request(name) for _ in range(self.requests)]
+        timings = [elapsed for elapsed, _ in samples]
+        queries = [count for _, count in samples]
+        return {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries),
+        }
+
+    def run(self, names=SCENARIOS):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(
+                SERVER_TIMING_HEADER=True,
+                CACHES=isolated_caches(location),
+            ):
+                return {name: self.measure(name) for name in names}
+
+
+def compare(results, baseline, tolerance=None):
+    """Регрессии относительно базовой линии: список сообщений.
+
+    p95 сравнивается, только если задан ``tolerance``.
+    """
+    regressions = []
+    for name, base in baseline['scenarios'].items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: SQL-запросов {current["queries"]}, '
+                f'в базовой линии {base["queries"]}'
+            )
+        if tolerance is None:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit:
+            regressions.append(
+                f'{name}: p95 {current["p95_ms"]:.1f} мс, '
+                f'допустимо до {limit:.1f} мс'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(path, scale, requests, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'scale': scale, 'requests': requests, 'host': host(),
+             'scenarios': results},
+            file, ensure_ascii=False, indent=2, sort_keys=True,
+        )
+        file.write('\n')
@@ -0,0 +1,166 @@
+"""Счётчики ссылок на файлы картинок постов.
+
+Картинки хранятся по содержимому (``posts.storage``), поэтому один файл
+может принадлежать нескольким постам. Сколько постов на него ссылается,
+хранит ``MediaBlob.ref_count``; его обновляют сигналы ``Post``
+атомарными ``F()``-выражениями. Файл вместе с миниатюрами sorl и
+копиями для srcset удаляется после коммита, когда ссылок не осталось;
+сохранение поста закрепляет уже существующий файл (``pin``), чтобы это
+удаление не пришлось на момент между проверкой и ссылкой.
+Файлы без строки ``MediaBlob`` не удаляются никогда. Картинки, загруженные
+до хранилища по содержимому, переносит ``manage.py dedupe_media``.
+"""
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from . import derivatives, feed_cache
+from .models import MediaBlob, Post
+from .storage import post_images
+
+
+def _is_managed(name):
+    """Файл лежит в хранилище картинок, а не где-то ещё на диске."""
+    if not name:
+        return False
+    try:
+        post_images.path(name)
+    except SuspiciousFileOperation:
+        return False
+    return True
+
+
+def pin(name):
+    """Не дать ``collect`` удалить файл до конца текущей транзакции.
+
+    Пустое обновление строки ``MediaBlob`` берёт блокировку записи
+    (строки в PostgreSQL, всей базы в SQLite). ``collect``, начатый позже,
+    дождётся коммита и увидит новую ссылку; закончившийся раньше уже
+    удалил файл, и хранилище запишет его заново.
+    """
+    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count'))
+
+
+def acquire(name):
+    if not _is_managed(name):
+        return
+    updated = MediaBlob.objects.filter(name=name).update(
+        ref_count=F('ref_count') + 1
+    )
+    if not updated:
+        MediaBlob.objects.get_or_create(
+            name=name,
+            defaults={'ref_count': Post.objects.filter(image=name).count()},
+        )
+
+
+def release(name):
+    if not _is_managed(name):
+        return
+    MediaBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1
+    )
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удалить файл и всё, что из него сделано, если ссылок не осталось.
+
+    Файлы удаляются до коммита, пока строка ``MediaBlob`` заблокирована:
+    иначе ``pin`` мог бы успеть увидеть ещё не удалённый файл.
+    """
+    with transaction.atomic():
+        # Сначала запись: она ждёт транзакции, закрепившие файл (pin).
+        deleted, _ = MediaBlob.objects.filter(
+            name=name, ref_count=0
+        ).delete()
+        if not deleted:
+            return False
+        if Post.objects.filter(image=name).exists():
+            transaction.set_rollback(True)
+            return False
+        delete_thumbnails(ImageFile(name, post_images))
+        derivatives.delete_files(name)
+    return True
+
+
+def image_saved(post, created):
+    name = post.image.name or ''
+    if created:
+        acquire(name)
+    elif post._counted_image is None:
+        # Пост загружен без картинки (only/defer): прежнее имя неизвестно.
+        return
+    elif post._counted_image != name:
+        release(post._counted_image)
+        acquire(name)
+    post._counted_image = name
+
+
+def image_deleted(post):
+    release(post.image.name)
+
+
+def _move(name):
+    """Перенести файл под имя по содержимому и перевести на него посты."""
+    with post_images.open(name) as file:
+        target = post_images.save(name, file)
+    posts = Post.objects.filter(image=name)
+    affected = list(posts.only('id', 'author_id', 'group_id'))
+    posts.update(image=target)
+    delete_thumbnails(ImageFile(name, post_images))
+    derivatives.delete_files(name)
+    derivatives.build(target)
+    for post in affected:
+        derivatives.record(post.pk, target)
+        feed_cache.bump_post(post)
+    return target
+
+
+def deduplicate(dry_run=False):
+    """Перенести старые картинки в хранилище по содержимому.
+
+    Возвращает число перенесённых файлов, из них слитых с уже
+    существующими, и имена файлов, которых нет на диске.
+    """
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    moved = merged = 0
+    missing = []
+    targets = set()
+    for name in list(names):
+        if not post_images.exists(name):
+            missing.append(name)
+            continue
+        with post_images.open(name) as file:
+            target = post_images.hashed_name(name, file)
+        if target == name:
+            continue
+        moved += 1
+        merged += target in targets or post_images.exists(target)
+        targets.add(target)
+        if not dry_run:
+            _move(name)
+    if not dry_run:
+        reconcile()
+    return moved, merged, missing
+
+
+def reconcile():
+    """Пересчитать ссылки на все файлы и удалить ненужные."""
+    counts = dict(
+        Post.objects.exclude(image='').order_by().values('image').annotate(
+            posts=Count('id')
+        ).values_list('image', 'posts')
+    )
+    for name, posts in counts.items():
+        MediaBlob.objects.update_or_create(
+            name=name, defaults={'ref_count': posts}
+        )
+    orphans = MediaBlob.objects.exclude(name__in=list(counts))
+    names = list(orphans.values_list('name', flat=True))
+    orphans.update(ref_count=0)
+    return sum(collect(name) for name in names)
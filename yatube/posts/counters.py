@@ -0,0 +1,198 @@
+"""Денормализованные счётчики вместо COUNT(*) на каждом запросе.
+
+Число постов хранится в ``Group.post_count`` и ``Profile.post_count`` и
+обновляется сигналами ``Post`` атомарными ``F()``-выражениями. Число
+подписчиков и подписок обновляют сигналы ``Follow``, число комментариев
+и время последнего из них в ``Post`` — сигналы ``Comment``.
+Расхождения исправляет ``manage.py reconcile_counters``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+
+def profile_counts(user_id):
+    """Значения счётчиков пользователя, посчитанные по таблицам."""
+    return {
+        'post_count': Post.objects.filter(author_id=user_id).count(),
+        'follower_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def profile_of(user):
+    """Счётчики пользователя; недостающий профиль создаётся пересчётом."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(
+            user=user, defaults=profile_counts(user.pk)
+        )
+        user.profile = profile
+        return profile
+
+
+def bump_profile(user_id, field, delta):
+    updated = Profile.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        # Профиля ещё нет: пересчёт уже учитывает сохранённую строку.
+        Profile.objects.get_or_create(
+            user_id=user_id, defaults=profile_counts(user_id)
+        )
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            post_count=F('post_count') + delta
+        )
+
+
+# Прежняя группа поста неизвестна: group_id был отложен (only/defer).
+UNKNOWN_GROUP = object()
+
+
+def _loaded_group_id(post):
+    # Через __dict__, чтобы не подгружать отложенное поле.
+    return post.__dict__.get('group_id', UNKNOWN_GROUP)
+
+
+def remember_group(post):
+    post._counted_group_id = _loaded_group_id(post)
+
+
+def fetch_saved_group(post):
+    """Перед сохранением узнать прежнюю группу, если её не загружали.
+
+    Нужно, только если отложенную группу присвоили заново: иначе
+    ``save()`` её не пишет, и счётчики не меняются.
+    """
+    if (post._counted_group_id is UNKNOWN_GROUP
+            and not post._state.adding
+            and _loaded_group_id(post) is not UNKNOWN_GROUP):
+        post._counted_group_id = Post.objects.filter(pk=post.pk).values_list(
+            'group_id', flat=True
+        ).first()
+
+
+def post_saved(post, created):
+    group_id = _loaded_group_id(post)
+    if created:
+        bump_profile(post.author_id, 'post_count', 1)
+        bump_group(post.group_id, 1)
+    elif UNKNOWN_GROUP in (post._counted_group_id, group_id):
+        pass
+    elif post._counted_group_id != group_id:
+        bump_group(post._counted_group_id, -1)
+        bump_group(group_id, 1)
+    post._counted_group_id = group_id
+
+
+def post_deleted(post):
+    bump_profile(post.author_id, 'post_count', -1)
+    bump_group(post.group_id, -1)
+
+
+def follow_changed(user_id, author_id, delta):
+    bump_profile(user_id, 'following_count', delta)
+    bump_profile(author_id, 'follower_count', delta)
+
+
+def _last_comment():
+    return Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by(
+            '-created'
+        ).values('created')[:1]
+    )
+
+
+def comment_saved(comment, created):
+    if created:
+        Post.objects.filter(pk=comment.post_id).update(
+            comment_count=F('comment_count') + 1,
+            last_commented_at=comment.created,
+        )
+
+
+def comment_deleted(comment):
+    Post.objects.filter(pk=comment.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        last_commented_at=_last_comment(),
+    )
+
+
+def _count(queryset, field, outer):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile(dry_run=False):
+    """Пересчитать все счётчики одним UPDATE на таблицу.
+
+    Возвращает число исправленных групп, профилей, постов и созданных
+    профилей.
+    """
+    real_profile = {
+        'post_count': _count(Post.objects.all(), 'author', 'user_id'),
+        'follower_count': _count(Follow.objects.all(), 'author', 'user_id'),
+        'following_count': _count(Follow.objects.all(), 'user', 'user_id'),
+    }
+    real_group = {'post_count': _count(Post.objects.all(), 'group', 'pk')}
+    drifted_profiles = Profile.objects.annotate(
+        **{f'real_{name}': value for name, value in real_profile.items()}
+    ).exclude(
+        **{name: F(f'real_{name}') for name in real_profile}
+    ).values_list('pk', flat=True)
+    drifted_groups = Group.objects.annotate(
+        real_post_count=real_group['post_count']
+    ).exclude(post_count=F('real_post_count')).values_list('pk', flat=True)
+    real_post = {
+        'comment_count': _count(Comment.objects.all(), 'post', 'pk'),
+        'last_commented_at': _last_comment(),
+    }
+    drifted_posts = Post.objects.annotate(
+        real_comment_count=real_post['comment_count'],
+        real_last_commented_at=real_post['last_commented_at'],
+    ).filter(
+        ~Q(comment_count=F('real_comment_count'))
+        | Q(last_commented_at__lt=F('real_last_commented_at'))
+        | Q(last_commented_at__gt=F('real_last_commented_at'))
+        | Q(last_commented_at__isnull=True,
+            real_last_commented_at__isnull=False)
+        | Q(last_commented_at__isnull=False,
+            real_last_commented_at__isnull=True)
+    ).values_list('pk', flat=True)
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+    if dry_run:
+        return (
+            drifted_groups.count(), drifted_profiles.count(),
+            drifted_posts.count(), len(missing),
+        )
+    groups = Group.objects.filter(pk__in=list(drifted_groups)).update(
+        **real_group
+    )
+    profiles = Profile.objects.filter(pk__in=list(drifted_profiles)).update(
+        **real_profile
+    )
+    posts = Post.objects.filter(pk__in=list(drifted_posts)).update(
+        **real_post
+    )
+    created = Profile.objects.bulk_create(
+        [
+            Profile(user_id=user_id, **profile_counts(user_id))
+            for user_id in missing.iterator()
+        ],
+        batch_size=250,
+    )
+    return groups, profiles, posts, len(created)
@@ -0,0 +1,321 @@
+"""Генерация больших наборов данных для бенчмарков и стендов.
+
+Строки вставляются ``bulk_create`` пачками, поэтому сигналы моделей не
+срабатывают: ``generate`` после вставки сама достраивает то, что обычно
+делают они, — ленты подписок, счётчики, поисковый индекс, ссылки на
+файлы картинок и версии кеша лент. Даты постов
+и комментариев разнесены по прошлому, а случайность задаётся ``seed``:
+одинаковые параметры дают одинаковые данные.
+
+Картинки для постов рисует ``make_images``: кодирование JPEG упирается в
+процессор, поэтому оно идёт в отдельных процессах, а в хранилище файлы
+пишет основной процесс. Если генерация не удалась, ``discard_images``
+убирает картинки, на которые так и не сослался ни один пост.
+"""
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import blobs, counters, feed_cache, search
+from .models import Comment, Follow, Group, Post, TimelineEntry
+from .storage import post_images
+
+User = get_user_model()
+
+SCALES = {
+    '1k': {'users': 50, 'groups': 5, 'posts': 1000, 'comments': 2000,
+           'follows': 500},
+    '10k': {'users': 500, 'groups': 20, 'posts': 10_000, 'comments': 20_000,
+            'follows': 5000},
+    '100k': {'users': 5000, 'groups': 50, 'posts': 100_000,
+             'comments': 200_000, 'follows': 50_000},
+    '1m': {'users': 50_000, 'groups': 200, 'posts': 1_000_000,
+           'comments': 2_000_000, 'follows': 500_000},
+}
+PASSWORD = 'yatube-seed'
+WORDS = (
+    'питон', 'джанго', 'лента', 'пост', 'кеш', 'запрос', 'индекс', 'база',
+    'шаблон', 'группа', 'автор', 'подписка', 'комментарий', 'картинка',
+    'город', 'море', 'книга', 'музыка', 'утро', 'вечер', 'дорога', 'дом',
+)
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Дать ``bulk_create`` сохранить заданные даты вместо auto_now_add."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert(model, objects, batch_size):
+    """Вставить объекты пачками, не держа в памяти больше одной пачки.
+
+    Размер отдельного INSERT выбирает Django по пределу параметров базы.
+    """
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+def skewed(rng, items):
+    """Случайный элемент с перекосом к началу: популярные авторы и посты."""
+    return items[int(len(items) * rng.random() ** 2)]
+
+
+def text(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, words)))
+
+
+def render_image(seed, width=640, height=480):
+    """JPEG из случайных цветных прямоугольников; одинаков для seed."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (width, height), tuple(
+        rng.randrange(256) for _ in range(3)
+    ))
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle(
+            (x, y, x + rng.randrange(width // 2), y + rng.randrange(height)),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=85)
+    return output.getvalue()
+
+
+def make_images(count, seed=0, width=640, height=480, workers=1):
+    """Нарисовать ``count`` картинок и сохранить их в хранилище постов.
+
+    При ``workers`` больше одного картинки рисуются в пуле процессов.
+    Возвращает имена файлов для поля ``Post.image``.
+    """
+    seeds = range(seed * count, seed * count + count)
+    sizes = [width] * count, [height] * count
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            images = pool.map(
+                render_image, seeds, *sizes,
+                chunksize=max(count // (workers * 4), 1),
+            )
+            return [
+                post_images.save('posts/seed.jpg', ContentFile(data))
+                for data in images
+            ]
+    return [
+        post_images.save('posts/seed.jpg', ContentFile(render_image(*args)))
+        for args in zip(seeds, *sizes)
+    ]
+
+
+def discard_images(names):
+    """Удалить картинки ``make_images``, на которые не ссылается ни один пост.
+
+    Одинаковые картинки хранятся одним файлом, поэтому файлы, которые
+    уже нужны постам прошлых запусков, остаются.
+    """
+    names = set(names)
+    used = set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    ))
+    for name in names - used:
+        post_images.delete(name)
+    return len(names - used)
+
+
+class Generator:
+    def __init__(self, users, groups, posts, comments, follows, seed=0,
+                 prefix='seed', days=365, batch_size=1000, progress=None,
+                 images=()):
+        self.sizes = {
+            'users': users, 'groups': groups, 'posts': posts,
+            'comments': comments, 'follows': follows,
+        }
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.progress = progress or (lambda stage, rows, seconds: None)
+        self.images = list(images)
+        self.now = timezone.now()
+        self.step = timedelta(days=days) / max(posts, 1)
+
+    def stage(self, name, func):
+        started = time.perf_counter()
+        rows = func()
+        self.progress(name, rows, time.perf_counter() - started)
+        return rows
+
+    def run(self):
+        with transaction.atomic(), explicit_dates(Post, Comment):
+            self.stage('users', self.users)
+            self.stage('groups', self.groups)
+            self.stage('posts', self.posts)
+            self.stage('follows', self.follows)
+            self.stage('comments', self.comments)
+            self.stage('timeline', self.timeline)
+            self.stage('counters', self.counters)
+            self.stage('search', self.search)
+            if self.images:
+                self.stage('blobs', self.blobs)
+        feed_cache.bump(
+            feed_cache.GLOBAL,
+            *map(feed_cache.group_scope, self.group_ids),
+            *map(feed_cache.author_scope, self.user_ids),
+        )
+
+    def users(self):
+        password = make_password(PASSWORD)
+        created = insert(User, (
+            User(username=f'{self.prefix}_u{i}', password=password,
+                 first_name='Автор', last_name=str(i))
+            for i in range(self.sizes['users'])
+        ), self.batch_size)
+        self.user_ids = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_u'
+        ).order_by('id').values_list('id', flat=True))
+        return created
+
+    def groups(self):
+        created = insert(Group, (
+            Group(title=f'Группа {i}', slug=f'{self.prefix}-{i}',
+                  description=text(self.rng))
+            for i in range(self.sizes['groups'])
+        ), self.batch_size)
+        self.group_ids = list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'
+        ).values_list('id', flat=True))
+        return created
+
+    def post_date(self, index):
+        return self.now - (self.sizes['posts'] - index) * self.step
+
+    def make_post(self, index):
+        group_id = None
+        if self.group_ids and self.rng.random() < 0.7:
+            group_id = self.rng.choice(self.group_ids)
+        image = ''
+        if self.images:
+            image = self.images[index % len(self.images)]
+        return Post(
+            author_id=skewed(self.rng, self.user_ids), group_id=group_id,
+            text=text(self.rng, 40), pub_date=self.post_date(index),
+            image=image,
+        )
+
+    def posts(self):
+        last = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        created = insert(Post, (
+            self.make_post(index) for index in range(self.sizes['posts'])
+        ), self.batch_size)
+        self.post_ids = list(Post.objects.filter(id__gt=last).order_by(
+            'id'
+        ).values_list('id', flat=True))
+        return created
+
+    def follows(self):
+        self.last_follow = Follow.objects.aggregate(last=Max('id'))['last']
+        pairs = set()
+        attempts = self.sizes['follows'] * 3
+        while len(pairs) < self.sizes['follows'] and attempts:
+            attempts -= 1
+            user_id = self.rng.choice(self.user_ids)
+            author_id = skewed(self.rng, self.user_ids)
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        return insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in sorted(pairs)
+        ), self.batch_size)
+
+    def make_comment(self):
+        index = len(self.post_ids) - 1 - int(
+            len(self.post_ids) * self.rng.random() ** 3
+        )
+        post_date = self.post_date(index)
+        age = (self.now - post_date).total_seconds()
+        return Comment(
+            post_id=self.post_ids[index],
+            author_id=self.rng.choice(self.user_ids),
+            text=text(self.rng),
+            created=post_date + timedelta(seconds=age * self.rng.random()),
+        )
+
+    def comments(self):
+        if not self.post_ids:
+            return 0
+        return insert(Comment, (
+            self.make_comment() for _ in range(self.sizes['comments'])
+        ), self.batch_size)
+
+    def timeline(self):
+        """Разложить посты по лентам новых подписок одним INSERT ... SELECT.
+
+        Авторы с числом подписчиков от порога, как и в ``timeline``,
+        читаются при чтении ленты и не раскладываются.
+        """
+        entries = TimelineEntry._meta.db_table
+        follows = Follow._meta.db_table
+        posts = Post._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {entries} (user_id, post_id, pub_date) '
+                f'SELECT f.user_id, p.id, p.pub_date FROM {follows} f '
+                f'JOIN {posts} p ON p.author_id = f.author_id '
+                f'WHERE f.id > %s AND f.author_id NOT IN ('
+                f'SELECT author_id FROM {follows} GROUP BY author_id '
+                f'HAVING COUNT(*) >= %s)',
+                [self.last_follow or 0, settings.TIMELINE_FANOUT_THRESHOLD],
+            )
+            return cursor.rowcount
+
+    def counters(self):
+        return sum(counters.reconcile())
+
+    def search(self):
+        search.get_backend().rebuild()
+        return len(self.post_ids)
+
+    def blobs(self):
+        """Завести ``MediaBlob`` для картинок: без них файлы не удаляются."""
+        blobs.reconcile()
+        return len(set(self.images))
+
+
+def generate(scale=None, **options):
+    """Сгенерировать набор данных масштаба ``scale`` из ``SCALES``.
+
+    Размеры можно переопределить именованными аргументами, остальные
+    параметры передаются ``Generator``.
+    """
+    sizes = dict(SCALES[scale]) if scale else {}
+    sizes.update(options)
+    generator = Generator(**sizes)
+    generator.run()
+    return generator
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import condition
+
+from . import feed_cache
+
+HITS = 'page_cache:hits'
+MISSES = 'page_cache:misses'
+
+
+# Счётчики копятся в процессе и уходят в кеш не чаще раза в
+# PAGE_CACHE_STATS_INTERVAL секунд, а не записью на каждый запрос.
+_pending = Counter()
+_lock = threading.Lock()
+_flushed_at = None
+
+
+def _take_pending():
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    pending = dict(_pending)
+    _pending.clear()
+    return pending
+
+
+def _flush(pending):
+    for key, delta in pending.items():
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Запись вытеснили между add и incr.
+            cache.add(key, delta, None)
+
+
+def _count(key):
+    with _lock:
+        _pending[key] += 1
+        if _flushed_at is not None and (
+            time.monotonic() - _flushed_at
+            < settings.PAGE_CACHE_STATS_INTERVAL
+        ):
+            return
+        pending = _take_pending()
+    _flush(pending)
+
+
+def stats():
+    """Число попаданий и промахов кеша страниц по всем процессам.
+
+    Другие процессы досылают свои счётчики с задержкой до
+    ``PAGE_CACHE_STATS_INTERVAL`` секунд.
+    """
+    with _lock:
+        pending = _take_pending()
+    _flush(pending)
+    values = cache.get_many([HITS, MISSES])
+    return {
+        'hits': values.get(HITS, 0),
+        'misses': values.get(MISSES, 0),
+    }
+
+
+def _page_scopes(request, scopes, kwargs):
+    # Области нужны и ETag, и кешу страниц: ищем их один раз на запрос.
+    if not hasattr(request, '_feed_scopes'):
+        request._feed_scopes = scopes(request, **kwargs)
+    return request._feed_scopes
+
+
+def feed_etag(scopes):
+    """Условный GET по версиям ``feed_cache`` вместо рендера страницы.
+
+    ETag строится из версий областей страницы, пути со строкой запроса
+    и, для авторизованных, пользователя и CSRF-cookie, поэтому ответ 304
+    отдаётся до запросов ленты и шаблона.
+    """
+    def etag(request, *args, **kwargs):
+        page_scopes = _page_scopes(request, scopes, kwargs)
+        if page_scopes is None:
+            return None
+        parts = [
+            feed_cache.get_version(*page_scopes),
+            iri_to_uri(request.get_full_path()),
+        ]
+        if request.user.is_authenticated:
+            parts += [
+                str(request.user.pk),
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            ]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return condition(etag_func=etag)
+
+
+def anonymous_page_cache(scopes):
+    """Кешировать готовый ответ страницы для анонимных посетителей.
+
+    ``scopes(request, **kwargs)`` возвращает области ``feed_cache``, от
+    которых зависит страница; их версии входят в ключ вместе с путём и
+    строкой запроса, поэтому изменения постов и комментариев сразу дают
+    новый ключ. ``None`` вместо списка отключает кеш для запроса.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            page_scopes = _page_scopes(request, scopes, kwargs)
+            if page_scopes is None:
+                return view(request, *args, **kwargs)
+            path = iri_to_uri(request.get_full_path()).encode()
+            key = 'page_cache:{}:{}'.format(
+                feed_cache.get_version(*page_scopes),
+                hashlib.md5(path).hexdigest(),
+            )
+            response = cache.get(key)
+            if response is not None:
+                _count(HITS)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+            _count(MISSES)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
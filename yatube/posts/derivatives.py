@@ -0,0 +1,257 @@
+"""Копии картинок постов нескольких ширин в WebP и JPEG для ``srcset``.
+
+Строки ``PostImage`` с размерами копий ширин ``POST_IMAGE_WIDTHS`` в
+форматах ``POST_IMAGE_FORMATS`` записывает сохранение поста с новой
+картинкой (``record``): размеры берутся из заголовка файла, рисовать для
+этого ничего не нужно. Сами файлы после коммита рисует пул миниатюр
+(``schedule``); копии общие для всех постов с одинаковой картинкой
+(``posts.storage``), поэтому задача пула — одна на картинку. Поток пула
+базу не трогает: дорисовав файлы, он отмечает картинку готовой в кеше.
+``prefetch`` отдаёт шаблону копии только готовых картинок, так что
+``srcset`` никогда не ссылается на ещё не записанный файл, а пока копий
+нет, шаблон показывает миниатюру из ``posts.thumbnails``. Показ страницы
+в базу не пишет; копии постов, созданных в обход ``save``, записывает
+``manage.py warm_thumbnails``.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import thumbnails
+from .models import PostImage
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+ORIENTATION = 0x0112
+# Значения Orientation, при которых ширина и высота меняются местами.
+ROTATED = (5, 6, 7, 8)
+
+PIL_FORMATS = {
+    PostImage.WEBP: ('WEBP', 'webp'),
+    PostImage.JPEG: ('JPEG', 'jpg'),
+}
+
+
+def _widths(source_width):
+    return sorted({
+        min(width, source_width) for width in settings.POST_IMAGE_WIDTHS
+    })
+
+
+def _flatten(image):
+    """RGB для JPEG: прозрачные места заливаются белым."""
+    if image.mode == 'RGB':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _encode(image, format_):
+    pil_format, _ = PIL_FORMATS[format_]
+    if format_ == PostImage.JPEG:
+        image = _flatten(image)
+    buffer = BytesIO()
+    image.save(
+        buffer, pil_format,
+        quality=settings.POST_IMAGE_QUALITY, optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def _prefix(image_name):
+    if image_name.startswith('posts/'):
+        image_name = image_name[len('posts/'):]
+    return f'posts/derivatives/{image_name}_'
+
+
+def _source_size(image):
+    width, height = image.size
+    if image.getexif().get(ORIENTATION) in ROTATED:
+        return height, width
+    return width, height
+
+
+def _ready_key(image_name):
+    digest = hashlib.md5(image_name.encode()).hexdigest()
+    return f'derivatives_ready:{digest}'
+
+
+def plan(image_name, post_id=None):
+    """Несохранённые ``PostImage`` копий картинки: имена файлов и размеры.
+
+    Читает только заголовок картинки.
+    """
+    prefix = _prefix(image_name)
+    with post_images.open(image_name) as source:
+        source_width, source_height = _source_size(Image.open(source))
+    derivatives = []
+    for width in _widths(source_width):
+        height = max(1, round(source_height * width / source_width))
+        for format_ in settings.POST_IMAGE_FORMATS:
+            _, extension = PIL_FORMATS[format_]
+            derivatives.append(PostImage(
+                post_id=post_id, format=format_, width=width,
+                height=height, file=f'{prefix}{width}.{extension}',
+            ))
+    return derivatives
+
+
+def render(image_name):
+    """Записать недостающие файлы копий картинки.
+
+    Базу не трогает, поэтому может выполняться в любом потоке. Если ту же
+    картинку одновременно рисует другой процесс, хранилище сохранит
+    второй файл с суффиксом; такой дубль сразу удаляется.
+    """
+    missing = [
+        derivative for derivative in plan(image_name)
+        if not default_storage.exists(derivative.file.name)
+    ]
+    if not missing:
+        return
+    with post_images.open(image_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    resized = {}
+    for derivative in missing:
+        size = (derivative.width, derivative.height)
+        if size not in resized:
+            resized[size] = image.resize(size, Image.LANCZOS)
+        name = derivative.file.name
+        saved = default_storage.save(
+            name, ContentFile(_encode(resized[size], derivative.format)),
+        )
+        if saved != name:
+            default_storage.delete(saved)
+
+
+def build(image_name):
+    """Нарисовать файлы копий и отметить картинку готовой.
+
+    Вернуть ``False``, если не удалось.
+    """
+    try:
+        render(image_name)
+    except Exception:
+        logger.exception('Не удалось создать копии картинки %s', image_name)
+        return False
+    cache.set(_ready_key(image_name), True, None)
+    return True
+
+
+def schedule(image_name):
+    """Поставить рисование файлов копий картинки в пул миниатюр."""
+    if not settings.THUMBNAIL_WORKERS:
+        build(image_name)
+        return
+    thumbnails.submit(('derivatives', image_name), build, image_name)
+
+
+def record(post_id, image_name):
+    """Заменить строки копий поста копиями картинки ``image_name``.
+
+    Файлы не рисует: их ставит в пул тот, кто записал строки. Вернуть
+    записанные копии; если картинка не читается, у поста их не будет.
+    """
+    PostImage.objects.filter(post_id=post_id).delete()
+    if not image_name:
+        return []
+    try:
+        derivatives = plan(image_name, post_id)
+    except Exception:
+        logger.exception('Не удалось прочитать картинку %s', image_name)
+        return []
+    return PostImage.objects.bulk_create(derivatives)
+
+
+def delete_files(image_name):
+    """Удалить файлы копий картинки, которая больше никому не нужна."""
+    cache.delete(_ready_key(image_name))
+    directory, base = posixpath.split(_prefix(image_name))
+    if not default_storage.exists(directory):
+        return
+    for filename in default_storage.listdir(directory)[1]:
+        if filename.startswith(base):
+            default_storage.delete(posixpath.join(directory, filename))
+
+
+def _group(derivatives):
+    grouped = {}
+    for derivative in derivatives:
+        grouped.setdefault(derivative.format, []).append(derivative)
+    return grouped
+
+
+def _ready(by_image):
+    """Имена картинок, все файлы копий которых уже записаны.
+
+    Обычно ответ даёт одно обращение к кешу; картинку без отметки
+    проверяет хранилище, а недорисованную ставит в пул.
+    """
+    keys = {_ready_key(name): name for name in by_image}
+    ready = {keys[key] for key in cache.get_many(list(keys))}
+    for name, derivatives in by_image.items():
+        if name in ready:
+            continue
+        if all(
+            default_storage.exists(derivative.file.name)
+            for derivative in derivatives
+        ):
+            cache.set(_ready_key(name), True, None)
+        else:
+            schedule(name)
+            # Без пула файлы нарисованы прямо в schedule.
+            if not cache.get(_ready_key(name)):
+                continue
+        ready.add(name)
+    return ready
+
+
+def prefetch(posts):
+    """Загрузить копии картинок страницы постов одним запросом.
+
+    Копии кладутся в ``post.image_derivatives`` по форматам; их читает
+    тег ``post_srcset``. Копии картинок, файлы которых ещё рисуются, не
+    отдаются: такая страница покажет миниатюру до истечения своего кеша.
+    В базу ничего не пишет.
+    """
+    by_post = {}
+    for post in posts:
+        post.image_derivatives = {}
+        if post.image:
+            by_post[post.pk] = post
+    if not by_post:
+        return posts
+    rows = {}
+    for derivative in PostImage.objects.filter(post_id__in=by_post):
+        rows.setdefault(derivative.post_id, []).append(derivative)
+    ready = _ready({
+        by_post[post_id].image.name: derivatives
+        for post_id, derivatives in rows.items()
+    })
+    for post_id, derivatives in rows.items():
+        post = by_post[post_id]
+        if post.image.name in ready:
+            post.image_derivatives = _group(derivatives)
+    return posts
+
+
+def srcset(post, format_):
+    """Значение атрибута ``srcset`` для копий поста в формате ``format_``."""
+    if getattr(post, 'image_derivatives', None) is None:
+        prefetch([post])
+    return ', '.join(
+        f'{derivative.file.url} {derivative.width}w'
+        for derivative in post.image_derivatives.get(format_, ())
+    )
@@ -0,0 +1,79 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Таблица читается кусками по первичному ключу (``pk > последний``), и
+каждый кусок — отдельный короткий запрос через ``.iterator()``: в памяти
+не больше ``chunk_size`` строк, а запрос не замедляется к концу таблицы,
+как ``OFFSET``. Строки отдаются генератором строк JSON Lines или CSV,
+который одинаково пишется в файл и в ``StreamingHttpResponse``.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+
+DATASETS = {
+    'posts': (Post, ('id', 'author_id', 'group_id', 'pub_date', 'text',
+                     'image', 'comment_count')),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'created',
+                           'text')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+
+
+def keyset(queryset, fields, chunk_size=CHUNK_SIZE):
+    """Строки ``values_list(*fields)`` по возрастанию pk кусками.
+
+    Первым полем должен быть первичный ключ.
+    """
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size должен быть не меньше 1: {chunk_size}')
+    last = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        count = 0
+        for row in chunk.values_list(*fields)[:chunk_size].iterator():
+            count += 1
+            last = row[0]
+            yield row
+        if count < chunk_size:
+            return
+
+
+def plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def jsonl(fields, rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(fields, map(plain, row))), ensure_ascii=False
+        ) + '\n'
+
+
+class Echo:
+    """Файл для ``csv.writer``, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([plain(value) for value in row])
+
+
+FORMATS = {'jsonl': jsonl, 'csv': csv_lines}
+
+
+def export(queryset, fields, fmt='jsonl', chunk_size=CHUNK_SIZE):
+    """Строки выгрузки ``queryset`` в формате ``fmt``."""
+    return FORMATS[fmt](fields, keyset(queryset, fields, chunk_size))
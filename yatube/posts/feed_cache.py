@@ -0,0 +1,82 @@
+"""Версии кеша лент.
+
+У каждой области (вся лента, группа, автор) есть счётчик поколения в
+общем кеше. Он входит в ключи закешированных фрагментов и страниц, а
+сигналы ``Post`` и ``Comment`` увеличивают его, поэтому после изменения
+старые записи просто перестают находиться и кеш верен сразу, во всех
+процессах, которые смотрят в один бэкенд. К версии добавляется
+``read_stamp`` роутера: ответы, прочитанные с реплики, кешируются
+отдельно от ответов основной базы и от других синхронизаций реплики.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.routers import read_stamp
+
+GLOBAL = 'global'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def _key(scope):
+    return f'feed_version:{scope}'
+
+
+def _initial():
+    # После вытеснения счётчик не должен совпасть с одной из старых версий.
+    return int(time.time() * 1000)
+
+
+def get_version(*scopes):
+    """Составная версия областей для ключа кеша."""
+    keys = [_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial(), None)
+            versions[key] = cache.get(key)
+    version = '.'.join(str(versions[key]) for key in keys)
+    stamp = read_stamp()
+    return f'{version}:{stamp}' if stamp else version
+
+
+def bump(*scopes):
+    """Сделать недействительным всё, что закешировано для областей.
+
+    Внутри транзакции версии растут сразу и ещё раз после коммита.
+    Параллельный запрос, получивший новую версию до коммита, читает
+    старые строки и кеширует их под промежуточной версией, а её второй
+    шаг оставляет позади. Первый шаг нужен чтениям в той же транзакции и
+    тестам, которые транзакцию не коммитят.
+    """
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _key(scope)
+        # Не cache.incr(): он сохраняет значение с таймаутом по умолчанию.
+        version = cache.get(key) or _initial()
+        cache.set(key, version + 1, None)
+
+
+def bump_post(post, *extra_group_ids):
+    scopes = [GLOBAL, author_scope(post.author_id), post_scope(post.pk)]
+    for group_id in (post.group_id, *extra_group_ids):
+        if group_id is not None:
+            scopes.append(group_scope(group_id))
+    bump(*scopes)
@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 from posts.models import Post, Comment
+from posts import uploads
 
 
 User = get_user_model()
@@ -20,6 +22,17 @@ class PostForm(forms.ModelForm):
             'group': 'Группа публикации',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанный BoundedFileUploadHandler файл не картинка: убираем его
+        # до ImageField, чтобы сообщить о размере, а не о битом файле.
+        self.oversized_image = None
+        image = self.files.get('image')
+        if image is not None and uploads.is_too_large(image):
+            self.files = self.files.copy()
+            del self.files['image']
+            self.oversized_image = image
+
     def clean_text(self):
         text = self.cleaned_data['text']
         if not len(text):
@@ -28,6 +41,15 @@ class PostForm(forms.ModelForm):
             )
         return text
 
+    def clean_image(self):
+        if self.oversized_image is not None:
+            uploads.check_size(self.oversized_image)
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        uploads.check_pixels(image)
+        return uploads.process_image(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
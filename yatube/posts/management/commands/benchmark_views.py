@@ -0,0 +1,103 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+from posts import benchmark
+from posts.datagen import SCALES, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон представлений ленты на сгенерированных данных: '
+        'p50/p95 и число SQL-запросов по сценариям, сравнение с базовой '
+        'линией. Работает на временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='10k')
+        parser.add_argument('--requests', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIOS,
+            dest='scenarios', help='Можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON базовой линии, по умолчанию '
+                 'benchmarks/baseline_<scale>.json.',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float,
+            help='Сравнивать и p95: допустимое замедление в долях базовой '
+                 'линии. Без флага сравнивается только число '
+                 'SQL-запросов: время зависит от машины.',
+        )
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        path = options['baseline'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f'baseline_{scale}.json'
+        )
+        results = self.run(options)
+        self.report(results)
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            benchmark.save_baseline(path, scale, options['requests'], results)
+            self.stdout.write(f'Базовая линия записана в {path}')
+            return
+        if not os.path.exists(path):
+            self.stdout.write(
+                f'Базовой линии {path} нет, сравнивать не с чем.'
+            )
+            return
+        baseline = benchmark.load_baseline(path)
+        if (options['tolerance'] is not None
+                and baseline.get('host') != benchmark.host()):
+            self.stdout.write(self.style.WARNING(
+                'Базовая линия снята на другой машине '
+                f'({baseline.get("host")}), сравнение p95 ненадёжно.'
+            ))
+        regressions = benchmark.compare(
+            results, baseline, options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базовой линии:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def run(self, options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            generate(
+                options['scale'], seed=options['seed'], progress=self.stage
+            )
+            scenarios = benchmark.Scenarios(
+                options['requests'], options['seed']
+            )
+            return scenarios.run(
+                options['scenarios'] or benchmark.SCENARIOS
+            )
+        finally:
+            runner.teardown_databases(old_config)
+
+    def stage(self, name, rows, seconds):
+        self.stdout.write(f'{name:<10}{rows:>10} строк {seconds:>8.2f} с')
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"scenario":<14}{"p50 ms":>10}{"p95 ms":>10}{"queries":>10}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["queries"]:>10}'
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по содержимому: одинаковые '
+        'файлы сливаются в один, счётчики ссылок пересчитываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько файлов будет перенесено.',
+        )
+
+    def handle(self, *args, **options):
+        moved, merged, missing = blobs.deduplicate(options['dry_run'])
+        for name in missing:
+            self.stderr.write(f'Нет файла {name}, пропускаю.')
+        verb = 'Будет перенесено' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(
+            f'{verb} файлов: {moved}, из них дубликатов: {merged}.'
+        )
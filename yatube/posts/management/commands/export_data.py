@@ -0,0 +1,67 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSON Lines или CSV '
+        'для аналитики. Таблица читается кусками по первичному ключу, '
+        'поэтому память не зависит от её размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=export.DATASETS)
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl',
+            dest='fmt',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки, «-» — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжать выгрузку gzip.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Из какой базы читать, например из реплики.',
+        )
+
+    def open(self, output, compress):
+        if compress:
+            target = output
+            if output == '-':
+                # Двоичный поток под self.stdout: так работает и
+                # call_command(stdout=...). Сам stdout gzip не закроет.
+                target = getattr(self.stdout, 'buffer', None)
+                if target is None:
+                    raise CommandError(
+                        'stdout не двоичный, сжатую выгрузку пишите '
+                        'в файл: --output.'
+                    )
+                self.stdout.flush()
+            return gzip.open(target, 'wt', encoding='utf-8', newline='')
+        return open(output, 'w', encoding='utf-8', newline='')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть не меньше 1.')
+        model, fields = export.DATASETS[options['dataset']]
+        lines = export.export(
+            model.objects.using(options['database']), fields,
+            options['fmt'], options['chunk_size'],
+        )
+        if options['output'] == '-' and not options['gzip']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with self.open(options['output'], options['gzip']) as output:
+            output.writelines(lines)
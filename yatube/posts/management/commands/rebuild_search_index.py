@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        search.get_backend().rebuild()
+        self.stdout.write(f'Проиндексировано постов: {Post.objects.count()}.')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, подписчиков, '
+        'подписок и комментариев и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать число расхождений, ничего не менять.',
+        )
+
+    def handle(self, *args, **options):
+        groups, profiles, posts, missing = counters.reconcile(
+            options['dry_run']
+        )
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(
+            f'{verb}: групп {groups}, профилей {profiles}, постов {posts}, '
+            f'недостающих профилей {missing}.'
+        )
@@ -0,0 +1,94 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.datagen import (PASSWORD, SCALES, discard_images, generate,
+                           make_images)
+
+User = get_user_model()
+
+SIZES = ('users', 'groups', 'posts', 'comments', 'follows')
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро наполняет базу пользователями, группами, постами с '
+        'картинками, комментариями и подписками через bulk_create и '
+        'печатает скорость вставки по этапам. Миниатюры потом можно '
+        'создать командой warm_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='10k')
+        for size in SIZES:
+            parser.add_argument(
+                f'--{size}', type=int,
+                help='Переопределяет размер из --scale.',
+            )
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок нарисовать для постов.',
+        )
+        parser.add_argument('--image-width', type=int, default=640)
+        parser.add_argument('--image-height', type=int, default=480)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Процессов для рисования картинок.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug групп.',
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_u').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                f'укажите другой --prefix.'
+            )
+        sizes = {
+            size: options[size] for size in SIZES
+            if options[size] is not None
+        }
+        started = time.perf_counter()
+        images = ()
+        if options['images']:
+            images = self.stage('images', lambda: make_images(
+                options['images'], seed=options['seed'],
+                width=options['image_width'], height=options['image_height'],
+                workers=options['workers'],
+            ))
+        try:
+            generator = generate(
+                options['scale'], seed=options['seed'], prefix=prefix,
+                batch_size=options['batch_size'], images=images,
+                progress=self.report, **sizes
+            )
+        except Exception:
+            discard_images(images)
+            raise
+        rows = sum(generator.sizes.values()) + len(images)
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {rows} строк за {seconds:.1f} с '
+            f'({rows / seconds:.0f} строк/с). Пароль пользователей: '
+            f'{PASSWORD}.'
+        ))
+
+    def stage(self, name, func):
+        started = time.perf_counter()
+        result = func()
+        self.report(name, len(result), time.perf_counter() - started)
+        return result
+
+    def report(self, name, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(
+            f'{name:<10}{rows:>10} строк {seconds:>8.2f} с '
+            f'{rate:>10.0f} строк/с'
+        )
@@ -0,0 +1,179 @@
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'comment_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT, created REAL)',
+    'CREATE INDEX comment_post ON comment (post_id, created)',
+    'CREATE TABLE follow (id INTEGER PRIMARY KEY, user_id INTEGER, '
+    'author_id INTEGER, UNIQUE (user_id, author_id))',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает конкурентную запись в SQLite с настройками Django по '
+        'умолчанию и с SQLITE_PRAGMAS и постоянными соединениями. '
+        'Работает на временной базе и не трогает базу проекта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--followers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--posts', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Как было: журнал отката, новое соединение на каждый запрос,
+        # тайм-аут sqlite3 по умолчанию и BEGIN; как стало: настройки
+        # проекта с WAL и режим транзакций из DATABASES.
+        mode = settings.DATABASES['default'].get('OPTIONS', {}).get(
+            'transaction_mode'
+        )
+        profiles = (
+            ('default', {'journal_mode': 'delete'}, True, 'BEGIN'),
+            ('tuned',
+             {**settings.SQLITE_PRAGMAS, **settings.SQLITE_WAL_PRAGMAS},
+             False, f'BEGIN {mode}' if mode else 'BEGIN'),
+        )
+        self.stdout.write(
+            f'{"profile":<10}{"writes/s":>12}{"follows/s":>12}'
+            f'{"locked":>10}{"reads/s":>12}'
+        )
+        for name, pragmas, reconnect, begin in profiles:
+            self.begin = begin
+            self.users = itertools.count(1)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.populate(path, options['posts'])
+                writes, follows, locked, reads = self.run(
+                    path, pragmas, reconnect, options
+                )
+            seconds = options['seconds']
+            self.stdout.write(
+                f'{name:<10}{writes / seconds:>12.1f}'
+                f'{follows / seconds:>12.1f}{locked:>10}'
+                f'{reads / seconds:>12.1f}'
+            )
+
+    @staticmethod
+    def connect(path, pragmas):
+        # Как у Django: автокоммит, транзакции открываются явным BEGIN.
+        connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def populate(self, path, posts):
+        connection = self.connect(path, {})
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO post (text) VALUES (?)',
+            ((f'Пост {i}',) for i in range(posts)),
+        )
+        connection.close()
+
+    def write(self, connection, post_id):
+        # Как add_comment: комментарий и счётчик поста в одной транзакции.
+        connection.execute(self.begin)
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'Комментарий', time.time()),
+        )
+        connection.execute(
+            'UPDATE post SET comment_count = comment_count + 1 WHERE id = ?',
+            (post_id,),
+        )
+        connection.execute('COMMIT')
+
+    def follow(self, connection, post_id):
+        # Как profile_follow: get_or_create в atomic() — сначала чтение,
+        # потом запись. С простым BEGIN переход к записи после чужого
+        # коммита сразу даёт «locked», busy_timeout тут не помогает.
+        user_id = next(self.users)
+        connection.execute(self.begin)
+        found = connection.execute(
+            'SELECT id FROM follow WHERE user_id = ? AND author_id = ?',
+            (user_id, post_id),
+        ).fetchone()
+        if found is None:
+            connection.execute(
+                'INSERT INTO follow (user_id, author_id) VALUES (?, ?)',
+                (user_id, post_id),
+            )
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def read(connection, post_id):
+        connection.execute(
+            'SELECT post.id, post.comment_count, comment.text '
+            'FROM post LEFT JOIN comment ON comment.post_id = post.id '
+            'WHERE post.id = ? ORDER BY comment.created DESC LIMIT 20',
+            (post_id,),
+        ).fetchall()
+
+    def work(self, job, path, pragmas, reconnect, deadline, posts):
+        """Выполнять job до deadline; вернуть число успехов и блокировок."""
+        done = locked = 0
+        connection = None
+        while time.perf_counter() < deadline:
+            if connection is None or reconnect:
+                if connection is not None:
+                    connection.close()
+                connection = self.connect(path, pragmas)
+            try:
+                job(connection, done % posts + 1)
+                done += 1
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+        if connection is not None:
+            connection.close()
+        return done, locked
+
+    def run(self, path, pragmas, reconnect, options):
+        deadline = time.perf_counter() + options['seconds']
+        jobs = (
+            [self.write] * options['writers']
+            + [self.follow] * options['followers']
+            + [self.read] * options['readers']
+        )
+        results = [None] * len(jobs)
+
+        def run_job(index, job):
+            results[index] = self.work(
+                job, path, pragmas, reconnect, deadline, options['posts']
+            )
+
+        threads = [
+            threading.Thread(target=run_job, args=(index, job))
+            for index, job in enumerate(jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writers = options['writers']
+        followers = writers + options['followers']
+        writes = sum(done for done, _ in results[:writers])
+        follows = sum(done for done, _ in results[writers:followers])
+        reads = sum(done for done, _ in results[followers:])
+        locked = sum(locked for _, locked in results)
+        return writes, follows, locked, reads
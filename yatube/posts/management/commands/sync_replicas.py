@@ -0,0 +1,58 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import mark_synced
+
+
+def copy_database(source, target):
+    """Скопировать базу SQLite целиком через backup API.
+
+    Копия согласована: читатели реплики видят либо старую, либо новую
+    базу, а основная база в это время продолжает принимать записи.
+    """
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из '
+        'DATABASE_REPLICAS — локальная замена репликации. После копии '
+        'отмечает синхронизацию: без отметки реплика не читается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_DB_REPLICAS.'
+            )
+        primary = settings.DATABASES['default']['NAME']
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(primary, settings.DATABASES[alias]['NAME'])
+                mark_synced(alias)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'Скопировано реплик: {len(settings.DATABASE_REPLICAS)} '
+                f'за {elapsed:.0f} мс.'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
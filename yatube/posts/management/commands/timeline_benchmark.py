@@ -0,0 +1,116 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts import counters, timeline
+from posts.models import Follow, Post, TimelineEntry
+from posts.paginators import MergingCursorPaginator
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает fan-out on write и гибридную ленту подписок: '
+        'сколько строк ленты пишет один пост и как быстро читается лента. '
+        'Все данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--reads', type=int, default=50)
+        parser.add_argument('--threshold', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        reader, celebrity, authors = self.populate(options)
+        # Порог выше числа подписчиков: все посты раскладываются при записи.
+        strategies = (
+            ('fan-out', options['followers'] + 2),
+            ('hybrid', options['threshold']),
+        )
+        self.stdout.write(
+            f'{"strategy":<10}{"rows/post":>12}{"write ms":>12}'
+            f'{"read ms":>12}'
+        )
+        for name, threshold in strategies:
+            with override_settings(TIMELINE_FANOUT_THRESHOLD=threshold):
+                rows, write_ms = self.measure_write(celebrity, authors,
+                                                    options['posts'])
+                read_ms = self.measure_read(reader, options['reads'])
+            self.stdout.write(
+                f'{name:<10}{rows:>12.1f}{write_ms:>12.2f}{read_ms:>12.2f}'
+            )
+
+    def populate(self, options):
+        prefix = self.prefix = f'bench_{int(time.time())}'
+        reader = User.objects.create(username=f'{prefix}_reader')
+        celebrity = User.objects.create(username=f'{prefix}_celebrity')
+        User.objects.bulk_create(
+            User(username=f'{prefix}_author_{i}')
+            for i in range(options['authors'])
+        )
+        User.objects.bulk_create(
+            User(username=f'{prefix}_follower_{i}')
+            for i in range(options['followers'])
+        )
+        followers = User.objects.filter(
+            username__startswith=f'{prefix}_follower_'
+        )
+        authors = list(User.objects.filter(
+            username__startswith=f'{prefix}_author_'
+        ))
+        Follow.objects.bulk_create(
+            [Follow(user=user, author=celebrity) for user in followers]
+            + [Follow(user=reader, author=celebrity)]
+            + [Follow(user=reader, author=author) for author in authors]
+        )
+        # bulk_create не шлёт сигналов: счётчики, по которым лента
+        # выбирает стратегию, обновляются вручную.
+        counters.bump_profile(
+            celebrity.pk, 'follower_count', options['followers'] + 1
+        )
+        for author in authors:
+            counters.bump_profile(author.pk, 'follower_count', 1)
+        return reader, celebrity, authors
+
+    def measure_write(self, celebrity, authors, count):
+        entries = TimelineEntry.objects.filter(
+            user__username__startswith=self.prefix
+        )
+        entries.delete()
+        Post.objects.filter(author__in=[celebrity, *authors]).delete()
+        started = time.perf_counter()
+        for i in range(count):
+            Post.objects.create(author=celebrity, text=f'Пост {i}')
+            for author in authors:
+                Post.objects.create(author=author, text=f'Пост {i}')
+        elapsed = time.perf_counter() - started
+        posts = count * (len(authors) + 1)
+        rows = entries.count() / posts
+        return rows, elapsed * 1000 / posts
+
+    def measure_read(self, reader, reads):
+        started = time.perf_counter()
+        for _ in range(reads):
+            posts, sources = timeline.feed(reader)
+            paginator = MergingCursorPaginator(posts, 10, sources=sources)
+            page = paginator.get_cursor_page()
+            list(page)
+        return (time.perf_counter() - started) * 1000 / reads
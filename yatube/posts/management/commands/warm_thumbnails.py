@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import derivatives, feed_cache, thumbnails
+from posts.models import Post, PostImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создаёт миниатюры всех размеров POST_THUMBNAILS и копии '
+        'для srcset (POST_IMAGE_WIDTHS) картинок существующих постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Сколько картинок обрабатывать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.exclude(image='').only(
+            'id', 'image', 'author_id', 'group_id'
+        ))
+        images = {post.image.name: post.image for post in posts}
+        missing = {
+            name for name, image in images.items()
+            if not image.storage.exists(name)
+        }
+        for name in missing:
+            self.stderr.write(f'Нет файла {name}, пропускаю.')
+            del images[name]
+        jobs = [
+            (image, size)
+            for image in images.values()
+            for size in settings.POST_THUMBNAILS
+        ]
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            list(pool.map(lambda job: thumbnails.generate(*job), jobs))
+            built = sum(pool.map(derivatives.build, images))
+        done = set(PostImage.objects.values_list('post_id', flat=True))
+        recorded = 0
+        for post in posts:
+            if post.pk in done or post.image.name not in images:
+                continue
+            if derivatives.record(post.pk, post.image.name):
+                feed_cache.bump_post(post)
+                recorded += 1
+        # Запись в key-value store sorl — в основном потоке, как в запросах.
+        ready = sum(
+            thumbnails.url(image, size) != image.url for image, size in jobs
+        )
+        self.stdout.write(
+            f'Картинок: {len(images)}, готовых миниатюр: {ready} '
+            f'из {len(jobs)}, картинок с копиями: {built}, '
+            f'постов с новыми копиями: {recorded}.'
+        )
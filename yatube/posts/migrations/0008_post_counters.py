@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('posts', 'Profile')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    for group in Group.objects.iterator():
+        group.post_count = Post.objects.filter(group=group).count()
+        group.save(update_fields=['post_count'])
+    Profile.objects.bulk_create(
+        [
+            Profile(
+                user_id=user.pk,
+                post_count=Post.objects.filter(author_id=user.pk).count(),
+            )
+            for user in User.objects.iterator()
+        ],
+        batch_size=250,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число постов'),
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.RunPython(
+            fill_counters, migrations.RunPython.noop
+        ),
+    ]
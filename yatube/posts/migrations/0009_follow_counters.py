@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+def fill_follow_counters(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    for profile in Profile.objects.iterator():
+        profile.follower_count = Follow.objects.filter(
+            author_id=profile.user_id
+        ).count()
+        profile.following_count = Follow.objects.filter(
+            user_id=profile.user_id
+        ).count()
+        profile.save(update_fields=['follower_count', 'following_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписок'),
+        ),
+        migrations.RunPython(
+            fill_follow_counters, migrations.RunPython.noop
+        ),
+    ]
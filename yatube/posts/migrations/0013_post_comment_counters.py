@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:54
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def fill_comment_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    )
+    Post.objects.filter(comments__isnull=False).update(
+        comment_count=Subquery(
+            comments.annotate(total=Count('pk')).values('total')
+        ),
+        last_commented_at=Subquery(
+            comments.annotate(last=Max('created')).values('last')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Последний комментарий'),
+        ),
+        migrations.RunPython(
+            fill_comment_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -1,13 +1,43 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from .storage import post_images
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    """Модель с денормализованными счётчиками ``counter_fields``.
+
+    Счётчики меняются только ``update()`` с ``F()`` (``posts.counters``).
+    Сохранение существующего объекта их не пишет: значение из памяти
+    устарело бы и затёрло приращения других запросов.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Group(CountersModel):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    post_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
+
+    counter_fields = ('post_count',)
 
     def __str__(self) -> str:
         return self.title
@@ -17,7 +47,30 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    feed_related = ('author', 'group')
+    feed_deferred = (
+        'author__password',
+        'author__email',
+        'author__last_login',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа одним запросом."""
+        return self.select_related(*self.feed_related).defer(
+            *self.feed_deferred
+        )
+
+    def active_discussions(self):
+        """Посты с комментариями, недавно обсуждавшиеся выше."""
+        return self.filter(last_commented_at__isnull=False).order_by(
+            '-last_commented_at', '-id'
+        )
+
+
+class Post(CountersModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -46,16 +99,42 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_images,
         blank=True,
     )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    last_commented_at = models.DateTimeField(
+        'Последний комментарий', null=True, blank=True, db_index=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+    counter_fields = ('comment_count', 'last_commented_at')
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Файл картинки (post_images.save), строка поста и ссылка на файл
+        # (posts.blobs) — одна транзакция, иначе между проверкой «файл уже
+        # есть» и ссылкой на него blobs.collect успеет файл удалить.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -84,6 +163,10 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(
+            fields=['post', '-created', '-id'],
+            name='comment_post_created_idx')
+        ]
 
     def __str__(self):
         return self.post.text[:15]
@@ -110,6 +193,129 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follow')
         ]
+        indexes = [models.Index(
+            fields=['author', 'user'],
+            name='follow_author_user_idx')
+        ]
 
     def __str__(self):
         return f'{self.user} --> {self.author}'
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Записи ленты с постами, как ``PostQuerySet.for_feed``."""
+        return self.select_related(*(
+            f'post__{name}' for name in PostQuerySet.feed_related
+        )).defer(*(
+            f'post__{name}' for name in PostQuerySet.feed_deferred
+        ))
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry')
+        ]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='timeline_user_pub_date_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.user} <-- {self.post_id}'
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    post_count = models.PositiveIntegerField('Число постов', default=0)
+    follower_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user}: {self.post_count}'
+
+
+class PostImage(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата."""
+
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMAT_CHOICES = (
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='derivatives',
+        verbose_name='Пост',
+    )
+    format = models.CharField('Формат', max_length=4, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    file = models.ImageField(
+        'Файл',
+        upload_to='posts/derivatives/',
+        max_length=255,
+    )
+
+    class Meta:
+        ordering = ['format', 'width']
+        verbose_name = 'Размер картинки'
+        verbose_name_plural = 'Размеры картинок'
+        constraints = [models.UniqueConstraint(
+            fields=['post', 'format', 'width'],
+            name='unique_post_image')
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.format} {self.width}w'
+
+
+class MediaBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+
+    name = models.CharField('Файл', max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.ref_count}'
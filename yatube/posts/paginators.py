@@ -0,0 +1,286 @@
+import base64
+import heapq
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) с непрозрачными курсорами.
+
+    Страница выбирается условием на ключ сортировки вместо OFFSET,
+    поэтому любая страница стоит столько же, сколько первая, и не
+    требует COUNT(*). Обычный ``page(number)`` остаётся доступен для
+    старых ссылок вида ``?page=N``.
+
+    Ключом может быть и числовая аннотация, например ``rank`` поиска.
+
+    Общее число объектов можно передать готовым (``count``, например из
+    денормализованного счётчика) или ограничить сверху (``count_cap``):
+    тогда считаются не больше ``count_cap + 1`` строк, а
+    ``count_display`` показывает «10 000+». Лента выводит его, только
+    когда ``count_ready``: страницы по курсору число не считают.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), count=None, count_cap=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.known_count = count
+        self.count_cap = count_cap
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_cap is not None:
+            return self.object_list[:self.count_cap + 1].count()
+        return super().count
+
+    @property
+    def count_ready(self):
+        """Число объектов уже известно, и его показ не стоит запроса."""
+        return self.known_count is not None or 'count' in self.__dict__
+
+    @property
+    def count_display(self):
+        if self.count_cap is not None and self.count > self.count_cap:
+            return '{:,}+'.format(self.count_cap).replace(',', '\xa0')
+        return str(self.count)
+
+    def page(self, number):
+        page = super().page(number)
+        items = list(page.object_list)
+        page.object_list = items
+        page.cursor = None
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and page.has_next():
+            page.next_cursor = self.encode_cursor(items[-1], FORWARD)
+        if items and page.has_previous():
+            page.previous_cursor = self.encode_cursor(items[0], BACKWARD)
+        return page
+
+    def get_cursor_page(self, cursor=None):
+        """Вернуть страницу по курсору; битый курсор ведёт на первую."""
+        direction, key = self.decode_cursor(cursor)
+        ordering = self.ordering
+        if direction == BACKWARD:
+            ordering = tuple(self._reverse(name) for name in ordering)
+        items = self._fetch(key, ordering, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == BACKWARD:
+            items.reverse()
+            # Без ключа это страница «Последняя»: дальше ничего нет.
+            has_next, has_previous = key is not None, has_more
+        else:
+            has_next, has_previous = has_more, key is not None
+        page = Page(items, 1, self)
+        page.cursor = cursor if direction else None
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and has_next:
+            page.next_cursor = self.encode_cursor(items[-1], FORWARD)
+        if items and has_previous:
+            page.previous_cursor = self.encode_cursor(items[0], BACKWARD)
+        return page
+
+    @property
+    def last_cursor(self):
+        """Курсор последней страницы: обратный обход без ключа."""
+        return self._encode(BACKWARD, None)
+
+    def _field(self, name):
+        """Поле модели или ``None`` для аннотации (например, ``rank``)."""
+        try:
+            return self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def encode_cursor(self, obj, direction):
+        key = []
+        for name in self.fields:
+            field = self._field(name)
+            if field is None:
+                key.append(getattr(obj, name))
+            else:
+                key.append(field.value_to_string(obj))
+        return self._encode(direction, key)
+
+    def _decode_value(self, name, value):
+        field = self._field(name)
+        if field is not None:
+            return field.to_python(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(value)
+        return value
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, key = data['d'], data['k']
+            if direction not in (FORWARD, BACKWARD):
+                raise ValueError(direction)
+            if key is None:
+                return direction, None
+            if len(key) != len(self.fields):
+                raise ValueError(key)
+            key = [
+                self._decode_value(name, value)
+                for name, value in zip(self.fields, key)
+            ]
+            if any(value is None for value in key):
+                raise ValueError(key)
+        except (ValueError, TypeError, KeyError, ValidationError):
+            return None, None
+        return direction, key
+
+    @staticmethod
+    def _encode(direction, key):
+        raw = json.dumps({'d': direction, 'k': key}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def _fetch(self, key, ordering, limit):
+        return list(self._slice(self.object_list, key, ordering, limit))
+
+    def _slice(self, queryset, key, ordering, limit):
+        if key is not None:
+            queryset = queryset.filter(self._after(key, ordering))
+        return queryset.order_by(*ordering)[:limit]
+
+    def _after(self, key, ordering):
+        """Условие «строго после key» в порядке ordering.
+
+        Для ключа (a, b) это ``a < x OR (a = x AND b < y)`` с учётом
+        направления каждого поля.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, key):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+
+class MergingCursorPaginator(CursorPaginator):
+    """Курсорный пагинатор, сливающий несколько упорядоченных источников.
+
+    Каждый источник из ``sources`` читается своим запросом с тем же
+    курсором, а результаты сливаются k-way merge'ем по ключу сортировки
+    без повторов. ``object_list`` должен описывать объединение всех
+    источников: по нему работают ``count`` и старые ссылки ``?page=N``.
+
+    Источник — QuerySet или пара ``(queryset, ordering)``, если его
+    удобнее читать по другим полям с теми же значениями, например по
+    индексу денормализованной таблицы. Третий элемент ``(queryset,
+    ordering, related)`` — имя связи, через которую строки источника
+    дают объекты ``object_list``.
+    """
+
+    def __init__(self, object_list, per_page, sources=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.sources = []
+        for source in sources:
+            if not isinstance(source, tuple):
+                source = (source, self.ordering)
+            if len(source) == 2:
+                source += (None,)
+            self.sources.append(source)
+
+    def _fetch(self, key, ordering, limit):
+        backward = ordering != self.ordering
+        slices = []
+        for queryset, source_ordering, related in self.sources:
+            if backward:
+                source_ordering = [
+                    self._reverse(name) for name in source_ordering
+                ]
+            rows = self._slice(queryset, key, source_ordering, limit)
+            if related is not None:
+                rows = map(attrgetter(related), rows)
+            slices.append(rows)
+        merged = heapq.merge(
+            *slices,
+            key=lambda obj: tuple(getattr(obj, name) for name in self.fields),
+            reverse=ordering[0].startswith('-'),
+        )
+        items = []
+        seen = set()
+        for obj in merged:
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            items.append(obj)
+            if len(items) == limit:
+                break
+        return items
+
+
+def estimate_rows(model, using='default'):
+    """Число строк таблицы по статистике базы или ``None``.
+
+    SQLite знает его после ``ANALYZE`` (``sqlite_stat1``), PostgreSQL — из
+    ``pg_class.reltuples``. Статистика может отставать от таблицы.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            rows = [str(row[0]).split()[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    estimate = max((int(row) for row in rows), default=0)
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Номерной пагинатор без COUNT(*) по всей таблице — для админки.
+
+    Без фильтров число строк берётся из ``estimate_rows``, если оно больше
+    ``count_cap``; иначе, как и с фильтрами, считаются не больше
+    ``count_cap + 1`` строк.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count_cap=None):
+        super().__init__(
+            object_list, per_page, orphans, allow_empty_first_page
+        )
+        self.count_cap = count_cap or settings.COUNT_CAP
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.count_cap:
+                return estimate
+        return queryset.order_by()[:self.count_cap + 1].count()
@@ -0,0 +1,119 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд задаёт настройка ``POST_SEARCH_BACKEND``. Сигналы ``Post``
+обновляют его индекс (``index``/``remove``), а ``search`` сужает
+QuerySet постов до найденных и добавляет аннотацию ``rank`` (меньше —
+лучше), так что результаты листаются тем же ``CursorPaginator`` по
+ключу ``ordering``.
+
+``SQLiteFTSBackend`` хранит обратный индекс в виртуальной таблице FTS5
+``posts_post_fts`` (её создаёт миграция) и ранжирует по bm25.
+``SimpleSearchBackend`` индекса не держит и перебирает таблицу — для
+баз без FTS5.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+MAX_TERMS = 10
+
+
+def terms(query):
+    """Слова запроса без операторов и кавычек."""
+    return re.findall(r'\w+', query)[:MAX_TERMS]
+
+
+class BaseSearchBackend:
+    ordering = ('rank', '-id')
+
+    def index(self, post):
+        """Добавить или обновить пост в индексе."""
+
+    def remove(self, post_id):
+        """Убрать пост из индекса."""
+
+    def rebuild(self):
+        """Построить индекс заново по всем постам."""
+
+    def search(self, query, queryset=None):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск без индекса: все слова по подстроке, новые выше.
+
+    ``iregex``, а не ``icontains``: ``LIKE`` в SQLite не различает регистр
+    только у латиницы.
+    """
+
+    def search(self, query, queryset=None):
+        queryset = Post.objects.all() if queryset is None else queryset
+        for term in terms(query):
+            queryset = queryset.filter(text__iregex=re.escape(term))
+        return queryset.annotate(
+            rank=Value(0.0, output_field=FloatField())
+        ).order_by(*self.ordering)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Обратный индекс FTS5; rowid записи — id поста."""
+
+    table = 'posts_post_fts'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+
+    @staticmethod
+    def match(query):
+        """Выражение MATCH: все слова запроса, каждое — как префикс."""
+        return ' '.join(f'"{term}"*' for term in terms(query))
+
+    def search(self, query, queryset=None):
+        queryset = Post.objects.all() if queryset is None else queryset
+        match = self.match(query)
+        if not match:
+            return queryset.none()
+        # Таблица индекса присоединяется к постам один раз, и MATCH с
+        # bm25 считаются за один проход. Коррелированный подзапрос ранга
+        # повторял бы MATCH для каждой найденной строки.
+        return queryset.extra(
+            tables=[self.table],
+            where=[
+                f'{self.table}.rowid = "{Post._meta.db_table}"."id"',
+                f'{self.table} MATCH %s',
+            ],
+            params=[match],
+        ).annotate(rank=RawSQL(
+            f'{self.table}.rank', (), output_field=FloatField(),
+        )).order_by(*self.ordering)
+
+
+def get_backend():
+    return import_string(settings.POST_SEARCH_BACKEND)()
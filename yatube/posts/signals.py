@@ -0,0 +1,170 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import blobs, counters, derivatives, feed_cache, search, timeline
+from .models import Comment, Follow, Post, Profile
+
+User = get_user_model()
+
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    """id постов, которые удаляются сейчас вместе с комментариями."""
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    counters.remember_group(instance)
+
+
+@receiver(pre_save, sender=Post)
+def fetch_saved_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.fetch_saved_group(instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    instance._counted_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    previous = instance._counted_group_id
+    if previous is counters.UNKNOWN_GROUP:
+        feed_cache.bump_post(instance)
+    else:
+        feed_cache.bump_post(instance, previous)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, **kwargs):
+    # Каскад удаляет комментарии раньше поста: счётчики и кеш удаляемого
+    # поста им трогать незачем, пост сбросит кеш сам.
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    feed_cache.bump_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    counters.comment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id not in _deleting_posts():
+        counters.comment_deleted(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    # Карточки лент показывают число комментариев: сбрасываем и их.
+    post = Post.objects.filter(pk=instance.post_id).only(
+        'author_id', 'group_id'
+    ).first()
+    if post is None:
+        feed_cache.bump(feed_cache.post_scope(instance.post_id))
+    else:
+        feed_cache.bump_post(post)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    # Профили обоих пользователей показывают счётчики подписок.
+    feed_cache.bump(
+        feed_cache.author_scope(instance.author_id),
+        feed_cache.author_scope(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    counters.post_saved(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+
+
+# Раньше count_saved_image: тот запоминает новое имя картинки.
+@receiver(post_save, sender=Post)
+def record_image_derivatives(sender, instance, created, raw=False, **kwargs):
+    previous, name = instance._counted_image, instance.image.name or ''
+    if created:
+        changed = bool(name)
+    else:
+        # None: пост загружен без картинки, прежнее имя неизвестно.
+        changed = previous is not None and previous != name
+    if raw or not changed:
+        return
+    derivatives.record(instance.pk, name)
+    if name:
+        transaction.on_commit(lambda: derivatives.schedule(name))
+
+
+@receiver(post_save, sender=Post)
+def count_saved_image(sender, instance, created, **kwargs):
+    blobs.image_saved(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_image(sender, instance, **kwargs):
+    blobs.image_deleted(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+# Счётчик подписчиков меняется до ленты: по нему лента решает, раскладывать
+# ли посты автора.
+@receiver(post_save, sender=Follow)
+def count_and_backfill_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.follow_changed(instance.user_id, instance.author_id, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_and_prune_follow(sender, instance, **kwargs):
+    counters.follow_changed(instance.user_id, instance.author_id, -1)
+    timeline.prune(instance.user_id, instance.author_id)
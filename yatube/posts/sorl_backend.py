@@ -0,0 +1,119 @@
+"""Единственное место, где проект опирается на внутренности sorl-thumbnail.
+
+Публичный ``get_thumbnail`` делает всё сразу: ищет миниатюру, рисует её
+и пишет в key-value store в одном вызове. Фоновой генерации нужны эти
+шаги по отдельности, а ленте — поиск многих миниатюр разом, поэтому
+здесь используются закрытые методы ``ThumbnailBackend``
+(``_get_format``, ``_get_thumbnail_filename``, ``_create_thumbnail``) и
+устройство cached_db key-value store (``EMPTY_VALUE``, модель
+``KVStore``). Они не входят в API sorl, так что версия закреплена в
+requirements.txt и в ``SORL_VERSION``; тест сверяет её с установленной,
+и обновление sorl начинается с проверки этого модуля.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+SORL_VERSION = '12.6.3'
+
+
+class Backend(ThumbnailBackend):
+    """Бэкенд sorl с раздельными «найти», «сгенерировать», «запомнить»."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Источник, будущая миниатюра и опции — без генерации."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage), options
+
+    def generate(self, file_, geometry_string, **options):
+        """Записать файл миниатюры, если его ещё нет."""
+        source, thumbnail, options = self.thumbnail_file(
+            file_, geometry_string, **options
+        )
+        if thumbnail.exists():
+            return thumbnail
+        source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image
+            )
+            source.set_size(default.engine.get_image_size(source_image))
+            self._create_thumbnail(
+                source_image, geometry_string, options, thumbnail
+            )
+        finally:
+            default.engine.cleanup(source_image)
+        return thumbnail
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или ``None``, если файла ещё нет."""
+        source, thumbnail, _ = self.thumbnail_file(
+            file_, geometry_string, **options
+        )
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if not thumbnail.exists():
+            return None
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(thumbnail, source)
+        return thumbnail
+
+    def lookup_many(self, files, geometry_string, **options):
+        """Миниатюры, уже записанные в key-value store, по индексу файла.
+
+        Для cached_db key-value store — одно обращение к кешу и не больше
+        одного запроса к его таблице; для остальных хранилищ — публичный
+        ``kvstore.get`` на каждый файл.
+        """
+        thumbnails = [
+            self.thumbnail_file(file_, geometry_string, **options)[1]
+            for file_ in files
+        ]
+        if not hasattr(default.kvstore, 'cache'):
+            found = {}
+            for index, thumbnail in enumerate(thumbnails):
+                cached = default.kvstore.get(thumbnail)
+                if cached:
+                    found[index] = cached
+            return found
+        keys = [add_prefix(thumbnail.key) for thumbnail in thumbnails]
+        values = _get_many_raw(keys)
+        return {
+            index: deserialize_image_file(values[key])
+            for index, key in enumerate(keys) if key in values
+        }
+
+
+def _get_many_raw(keys):
+    """Пакетный аналог ``_get_raw`` из cached_db key-value store sorl."""
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'
+        ))
+        kv_cache.set_many(
+            {key: found.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(found)
+    return {
+        key: value for key, value in values.items()
+        if value is not EMPTY_VALUE
+    }
@@ -0,0 +1,47 @@
+import hashlib
+import posixpath
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы под именами из SHA-256 содержимого, каждый — один раз.
+
+    Файл ``posts/photo.jpg`` сохраняется как ``posts/ab/cd/abcd….jpg``.
+    Если такое содержимое уже есть, ничего не пишется и возвращается имя
+    существующего файла, поэтому одинаковые картинки разделяют и файл, и
+    миниатюры. Перед проверкой файл закрепляется (``posts.blobs.pin``) до
+    конца транзакции, в которой пост сошлётся на него.
+    """
+
+    def hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest[2:4],
+            digest + extension,
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        # blobs сам импортирует хранилище.
+        from . import blobs
+        with transaction.atomic():
+            blobs.pin(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+
+post_images = ContentAddressedStorage()
@@ -0,0 +1,34 @@
+from django import template
+
+from posts import derivatives, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail_url(post, size):
+    """Миниатюра картинки поста, по возможности из ``prefetch``."""
+    urls = getattr(post, 'thumbnail_urls', {})
+    if size in urls:
+        return urls[size]
+    return thumbnails.post_url(post, size)
+
+
+@register.simple_tag
+def prefetch_post_images(posts, size):
+    """Миниатюры и копии картинок страницы постов разом.
+
+    Вызывается внутри ``{% cache %}``, поэтому при попадании во фрагмент
+    кеша ничего не ищет.
+    """
+    thumbnails.prefetch(posts, size)
+    derivatives.prefetch(posts)
+    return ''
+
+
+@register.simple_tag
+def post_srcset(post, format_):
+    """``srcset`` копий картинки поста; пустая строка, если их ещё нет."""
+    if not post.image:
+        return ''
+    return derivatives.srcset(post, format_)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(
+                author=self.admin,
+                group=self.groups[i % 3] if i % 4 else None,
+                text=f'Пост {i}',
+            )
+            for i in range(count)
+        )
+
+    def test_group_widget_shows_selected_group(self):
+        """Виджет группы подписывает выбранную группу без запросов."""
+        self.create_posts(2)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        group = self.groups[1]
+        self.assertContains(
+            response, f'<option value="{group.pk}" selected>{group}</option>',
+            html=True,
+        )
+
+    def changelist_queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params or {}
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        self.create_posts(3)
+        few = self.changelist_queries()
+        few_found = self.changelist_queries({'q': 'Пост'})
+        self.create_posts(150)
+        self.assertEqual(self.changelist_queries(), few)
+        self.assertEqual(self.changelist_queries({'q': 'Пост'}), few_found)
+        self.assertLessEqual(few, 7)
+
+    @override_settings(COUNT_CAP=10)
+    def test_estimated_count_for_unfiltered_table(self):
+        """Без фильтров число строк берётся из статистики базы."""
+        self.create_posts(30)
+        queryset = Post.objects.all()
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 11)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 30)
+        filtered = queryset.filter(group__isnull=True)
+        self.assertEqual(EstimatedCountPaginator(filtered, 5).count, 8)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts import benchmark, counters
+from posts.datagen import generate
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+
+class DatagenTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.generator = generate(
+            users=10, groups=3, posts=60, comments=90, follows=20, seed=1,
+            batch_size=25,
+        )
+
+    def test_sizes(self):
+        """Созданы объекты в заданном количестве."""
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 90)
+        self.assertEqual(Follow.objects.count(), 20)
+
+    def test_dates_spread_over_past(self):
+        """Даты постов разнесены по прошлому, комментарии позже постов."""
+        dates = list(Post.objects.order_by('id').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater((dates[-1] - dates[0]).days, 300)
+        for comment in Comment.objects.select_related('post'):
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_timeline_filled(self):
+        """Лента подписчика содержит посты тех, на кого он подписан."""
+        expected = sum(
+            Post.objects.filter(author=follow.author).count()
+            for follow in Follow.objects.select_related('author')
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+
+    def test_counters_consistent(self):
+        """После генерации сверять счётчики нечего."""
+        self.assertEqual(sum(counters.reconcile(dry_run=True)), 0)
+
+
+@override_settings(SERVER_TIMING_HEADER=False)
+class ScenariosTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        generate(users=5, groups=2, posts=20, comments=20, follows=8)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_run_reports_every_scenario(self):
+        """Каждый сценарий даёт p50 ≤ p95 и число запросов."""
+        results = benchmark.Scenarios(requests=3, warmup=1).run()
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for result in results.values():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['queries'], 0)
+        self.assertFalse(settings.SERVER_TIMING_HEADER)
+
+    def test_run_keeps_project_cache(self):
+        """Прогон очищает свой временный кеш, а не кеш проекта."""
+        cache.set('benchmark:marker', 1)
+        benchmark.Scenarios(requests=1, warmup=0).run(['index'])
+        self.assertEqual(cache.get('benchmark:marker'), 1)
+
+
+class CompareTest(SimpleTestCase):
+    baseline = {'scenarios': {
+        'index': {'p50_ms': 5.0, 'p95_ms': 10.0, 'queries': 3},
+        'profile': {'p50_ms': 5.0, 'p95_ms': 10.0, 'queries': 6},
+    }}
+
+    def test_percentile(self):
+        values = list(range(1, 21))
+        self.assertEqual(benchmark.percentile(values, 50), 10)
+        self.assertEqual(benchmark.percentile(values, 95), 19)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_within_baseline(self):
+        results = {
+            'index': {'p50_ms': 6.0, 'p95_ms': 14.0, 'queries': 3},
+            'profile': {'p50_ms': 4.0, 'p95_ms': 9.0, 'queries': 5},
+        }
+        self.assertEqual(benchmark.compare(results, self.baseline, 0.5), [])
+
+    def test_regressions(self):
+        """Лишний запрос и p95 сверх допуска — регрессии."""
+        results = {
+            'index': {'p50_ms': 6.0, 'p95_ms': 16.0, 'queries': 3},
+            'profile': {'p50_ms': 4.0, 'p95_ms': 9.0, 'queries': 7},
+        }
+        regressions = benchmark.compare(results, self.baseline, 0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('index: p95'))
+        self.assertTrue(regressions[1].startswith('profile: SQL'))
+
+    def test_timings_opt_in(self):
+        """Без допуска сравнивается только число запросов."""
+        results = {
+            'index': {'p50_ms': 60.0, 'p95_ms': 160.0, 'queries': 3},
+        }
+        self.assertEqual(benchmark.compare(results, self.baseline), [])
@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import blobs
+from posts.models import MediaBlob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_content(color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name, color):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': name,
+                'image': SimpleUploadedFile(
+                    name, image_content(color), content_type='image/png'
+                ),
+            },
+        )
+        return Post.objects.get(text=name)
+
+    def test_same_content_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с двумя ссылками."""
+        first = self.upload('Patrick_star.png', 'blue')
+        second = self.upload('Patrick_star_copy.png', 'blue')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+            r'\.png$'
+        )
+        directory = first.image.name.rsplit('/', 1)[0]
+        self.assertEqual(len(default_storage.listdir(directory)[1]), 1)
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).ref_count, 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.upload('first.png', 'green')
+        second = self.upload('second.png', 'green')
+        name = first.image.name
+        first.delete()
+        self.assertFalse(blobs.collect(name))
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 0)
+        self.assertTrue(blobs.collect(name))
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_existing_file_pinned_before_post_insert(self):
+        """Повторная загрузка блокирует MediaBlob до вставки поста."""
+        first = self.upload('pinned.png', 'purple')
+        with CaptureQueriesContext(connection) as queries:
+            self.upload('pinned_copy.png', 'purple')
+        statements = [query['sql'] for query in queries]
+        pin = next(
+            index for index, sql in enumerate(statements)
+            if sql.startswith('UPDATE')
+            and MediaBlob._meta.db_table in sql
+        )
+        insert = next(
+            index for index, sql in enumerate(statements)
+            if sql.startswith('INSERT')
+            and f'"{Post._meta.db_table}"' in sql
+        )
+        self.assertLess(pin, insert)
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).ref_count, 2
+        )
+
+    def test_collected_file_written_again(self):
+        """Файл, удалённый collect, загрузка того же содержимого пишет
+        заново."""
+        first = self.upload('gone.png', 'orange')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(blobs.collect(name))
+        second = self.upload('back.png', 'orange')
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+    def test_dedupe_media_merges_legacy_duplicates(self):
+        """dedupe_media сливает старые дубликаты в один файл."""
+        content = image_content('yellow')
+        legacy = [
+            default_storage.save('posts/legacy.png', ContentFile(content)),
+            default_storage.save('posts/legacy.png', ContentFile(content)),
+        ]
+        self.assertNotEqual(legacy[0], legacy[1])
+        for name in legacy:
+            Post.objects.create(author=self.user, text=name, image=name)
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('Перенесено файлов: 2, из них дубликатов: 1.',
+                      out.getvalue())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(default_storage.exists(name))
+        for old in legacy:
+            with self.subTest(name=old):
+                self.assertFalse(default_storage.exists(old))
+                self.assertFalse(MediaBlob.objects.filter(name=old).exists())
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
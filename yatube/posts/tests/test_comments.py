@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_LIMIT=3)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        now = timezone.now()
+        cls.comments = []
+        for i in range(7):
+            comment = Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}'
+            )
+            # Два комментария в одну секунду: курсор различает их по id.
+            Comment.objects.filter(pk=comment.pk).update(
+                created=now - timedelta(seconds=i // 2)
+            )
+            cls.comments.append(comment)
+        cls.expected = list(
+            Comment.objects.filter(post=cls.post).order_by('-created', '-id')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_page(self):
+        """Страница поста показывает первую страницу комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        page = response.context['comments']
+        self.assertEqual(list(page), self.expected[:3])
+        self.assertContains(response, 'id="more-comments"')
+        self.assertContains(response, f'?comments={page.next_cursor}')
+
+    def test_fragment_pages_cover_all_comments(self):
+        """JSON-фрагменты отдают оставшиеся комментарии без повторов."""
+        detail = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        url = '{}?cursor={}'.format(
+            reverse('posts:post_comments', args=[self.post.id]),
+            detail.context['comments'].next_cursor,
+        )
+        seen = list(detail.context['comments'])
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            seen.extend(response.context['comments'])
+            data = response.json()
+            for comment in response.context['comments']:
+                self.assertIn(comment.text, data['html'])
+            url = data['next_url']
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fragment_for_missing_post(self):
+        """Для несуществующего поста фрагмент отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.id + 100])
+        )
+        self.assertEqual(response.status_code, 404)
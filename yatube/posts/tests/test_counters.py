@@ -0,0 +1,248 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, Profile
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def counts(self):
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        return (
+            Profile.objects.get(user=self.user).post_count,
+            self.group.post_count,
+            self.other_group.post_count,
+        )
+
+    def test_counters_follow_post_lifecycle(self):
+        """Счётчики меняются при создании, смене группы и удалении."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Текст'
+        )
+        Post.objects.create(author=self.user, text='Без группы')
+        self.assertEqual(self.counts(), (2, 1, 0))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Новый текст', 'group': self.other_group.id},
+        )
+        self.assertEqual(self.counts(), (2, 0, 1))
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_deferred_group_keeps_counters(self):
+        """Пост без загруженной группы сохраняется без сдвига счётчиков."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Текст'
+        )
+        deferred = Post.objects.only('id', 'text').get(pk=post.pk)
+        deferred.text = 'Новый текст'
+        deferred.save()
+        self.assertEqual(self.counts(), (1, 1, 0))
+        deferred = Post.objects.defer('group').get(pk=post.pk)
+        deferred.group = self.other_group
+        deferred.save()
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+    def test_missing_profile_is_recounted(self):
+        """Недостающий профиль создаётся с пересчитанным числом постов."""
+        Post.objects.create(author=self.user, text='Текст')
+        Profile.objects.filter(user=self.user).delete()
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'TestUser'})
+        )
+        self.assertEqual(response.context['post_count'], 1)
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_paginator_uses_known_count(self):
+        """Пагинатор не считает строки, если число передано."""
+        paginator = CursorPaginator(Post.objects.all(), 10, count=42)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 5)
+
+    def test_paginator_caps_count(self):
+        """Ограниченный подсчёт показывает «N+» вместо точного числа."""
+        for i in range(4):
+            Post.objects.create(author=self.user, text=f'Текст {i}')
+        paginator = CursorPaginator(Post.objects.all(), 10, count_cap=3)
+        self.assertEqual(paginator.count, 4)
+        self.assertEqual(paginator.count_display, '3+')
+        paginator = CursorPaginator(Post.objects.all(), 10, count_cap=10)
+        self.assertEqual(paginator.count_display, '4')
+
+
+class FollowCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def counts(self):
+        return (
+            Profile.objects.get(user=self.user).following_count,
+            Profile.objects.get(user=self.author).follower_count,
+        )
+
+    def follow(self, action):
+        self.authorized_client.get(
+            reverse(f'posts:{action}', kwargs={'username': 'author'})
+        )
+
+    def test_follow_counters_change_once(self):
+        """Повторная подписка и отписка не сдвигают счётчики."""
+        self.follow('profile_follow')
+        self.follow('profile_follow')
+        self.assertEqual(self.counts(), (1, 1))
+        self.follow('profile_unfollow')
+        self.follow('profile_unfollow')
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters исправляет разошедшиеся счётчики."""
+        self.follow('profile_follow')
+        Post.objects.create(author=self.author, text='Текст')
+        Profile.objects.filter(user=self.author).update(
+            follower_count=7, post_count=0
+        )
+        Profile.objects.filter(user=self.user).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(Profile.objects.get(user=self.author).post_count, 1)
+
+
+class CommentCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.post = Post.objects.create(author=self.user, text='Текст')
+
+    def comment(self, post):
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'},
+        )
+        return Comment.objects.filter(post=post).latest('created')
+
+    def state(self, post):
+        post.refresh_from_db()
+        return post.comment_count, post.last_commented_at
+
+    def test_counters_follow_comment_lifecycle(self):
+        """Число и время комментариев меняются при добавлении и удалении."""
+        self.assertEqual(self.state(self.post), (0, None))
+        first = self.comment(self.post)
+        second = self.comment(self.post)
+        self.assertEqual(self.state(self.post), (2, second.created))
+        second.delete()
+        self.assertEqual(self.state(self.post), (1, first.created))
+        first.delete()
+        self.assertEqual(self.state(self.post), (0, None))
+
+    def test_feed_card_shows_count(self):
+        """Карточка ленты показывает число комментариев без запросов."""
+        self.comment(self.post)
+        with self.assertNumQueries(3):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'комментариев: 1')
+
+    def test_active_discussions_ordering(self):
+        """Обсуждения сортируются по последнему комментарию."""
+        quiet = Post.objects.create(author=self.user, text='Без комментариев')
+        older = Post.objects.create(author=self.user, text='Старое')
+        self.comment(older)
+        self.comment(self.post)
+        self.comment(older)
+        self.assertEqual(
+            list(Post.objects.active_discussions()), [older, self.post]
+        )
+        self.assertNotIn(quiet, Post.objects.active_discussions())
+
+    def test_reconcile_fixes_comment_drift(self):
+        """reconcile_counters пересчитывает комментарии постов."""
+        comment = self.comment(self.post)
+        Post.objects.filter(pk=self.post.pk).update(
+            comment_count=5, last_commented_at=None
+        )
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('постов 1', out.getvalue())
+        self.assertEqual(self.state(self.post), (1, comment.created))
+
+    def test_stale_save_keeps_counters(self):
+        """Сохранение устаревшего объекта не затирает счётчики."""
+        stale = Post.objects.get(pk=self.post.pk)
+        comment = self.comment(self.post)
+        stale.text = 'Правка'
+        stale.save()
+        self.assertEqual(self.state(self.post), (1, comment.created))
+        self.assertEqual(self.post.text, 'Правка')
+        group = Group.objects.create(title='Группа', slug='group')
+        stale_group = Group.objects.get(pk=group.pk)
+        Post.objects.create(author=self.user, group=group, text='В группе')
+        stale_group.title = 'Другое название'
+        stale_group.save()
+        group.refresh_from_db()
+        self.assertEqual((group.title, group.post_count),
+                         ('Другое название', 1))
+
+    def test_edit_form_has_no_counters(self):
+        response = self.authorized_client.get(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id})
+        )
+        form = response.context['form']
+        self.assertNotIn('comment_count', form.fields)
+        self.assertNotIn('last_commented_at', form.fields)
+
+    def test_post_delete_skips_per_comment_work(self):
+        """Удаление поста не стоит запросов на каждый комментарий."""
+        def delete_cost(comments):
+            post = Post.objects.create(author=self.user, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text=str(i))
+                for i in range(comments)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        self.assertEqual(delete_cost(2), delete_cost(20))
+        other = Post.objects.create(author=self.user, text='Другой')
+        self.comment(other)
+        self.assertEqual(self.state(other)[0], 1)
@@ -0,0 +1,209 @@
+import posixpath
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import blobs, derivatives
+from posts.models import Post, PostImage
+from posts.tests.utils import commit_callbacks
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png', size=(1000, 500), mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_WORKERS=0,
+    POST_IMAGE_WIDTHS=(320, 640, 1280),
+)
+class DerivativesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, image):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': image}, follow=True,
+        )
+        return Post.objects.get(text='Текст')
+
+    def test_post_create_builds_derivatives(self):
+        """Копии всех ширин и форматов создаются без увеличения."""
+        post = self.create_post(make_image('wide.png', (1000, 500)))
+        expected = {
+            (format_, width, width // 2)
+            for format_ in settings.POST_IMAGE_FORMATS
+            for width in (320, 640, 1000)
+        }
+        self.assertEqual(
+            set(post.derivatives.values_list('format', 'width', 'height')),
+            expected,
+        )
+        for derivative in post.derivatives.all():
+            with self.subTest(file=derivative.file.name):
+                with default_storage.open(derivative.file.name) as file:
+                    image = Image.open(file)
+                    self.assertEqual(
+                        image.size, (derivative.width, derivative.height)
+                    )
+                    self.assertEqual(
+                        image.format,
+                        derivatives.PIL_FORMATS[derivative.format][0],
+                    )
+
+    def test_transparent_image_flattened_for_jpeg(self):
+        """Картинка с прозрачностью сохраняется и в JPEG."""
+        post = self.create_post(make_image('alpha.png', (100, 50), 'RGBA'))
+        self.assertEqual(post.derivatives.filter(format='jpeg').count(), 1)
+
+    def test_pages_render_srcset(self):
+        """Лента и страница поста отдают srcset обоих форматов."""
+        post = self.create_post(make_image('page.png'))
+        webp = derivatives.srcset(post, PostImage.WEBP)
+        jpeg = derivatives.srcset(post, PostImage.JPEG)
+        self.assertIn(' 1000w', webp)
+        for name in ('posts:index', 'posts:post_detail'):
+            with self.subTest(name=name):
+                args = (post.pk,) if name == 'posts:post_detail' else ()
+                response = self.client.get(reverse(name, args=args))
+                self.assertContains(response, 'type="image/webp"')
+                self.assertContains(response, f'srcset="{webp}"')
+                self.assertContains(response, f'srcset="{jpeg}"')
+
+    def test_post_edit_replaces_derivatives(self):
+        """Новая картинка заменяет копии прежней; файлы удаляются вместе
+        с ненужной больше картинкой."""
+        post = self.create_post(make_image('old.png'))
+        old_image = post.image.name
+        old_files = list(post.derivatives.values_list('file', flat=True))
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'Текст', 'image': make_image('new.png', (200, 100))},
+            follow=True,
+        )
+        self.assertEqual(
+            set(post.derivatives.values_list('width', flat=True)), {200}
+        )
+        # В TestCase on_commit не срабатывает: собираем файл явно.
+        self.assertTrue(blobs.collect(old_image))
+        for name in [old_image, *old_files]:
+            with self.subTest(name=name):
+                self.assertFalse(default_storage.exists(name))
+
+    def test_save_records_derivatives_before_files(self):
+        """Строки копий пишет сохранение поста, файлы — задача после
+        коммита."""
+        with commit_callbacks(execute=False) as callbacks:
+            post = Post.objects.create(
+                author=self.user, text='Текст',
+                image=make_image('saved.png', (102, 51)),
+            )
+        self.assertEqual(
+            set(post.derivatives.values_list('width', 'height')), {(102, 51)}
+        )
+        files = list(post.derivatives.values_list('file', flat=True))
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+        for name in files:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_page_view_does_not_write(self):
+        """Показ поста с ещё не нарисованными копиями не пишет в базу."""
+        with commit_callbacks(execute=False):
+            post = Post.objects.create(
+                author=self.user, text='Текст',
+                image=make_image('view.png', (104, 52)),
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(post.pk,))
+            )
+        self.assertContains(response, ' 104w')
+        for query in queries:
+            with self.subTest(sql=query['sql']):
+                self.assertTrue(query['sql'].startswith('SELECT'))
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_one_job_per_image(self):
+        """Посты с одной картинкой ставят в пул одну задачу по её имени."""
+        first = Post.objects.create(
+            author=self.user, text='Первый',
+            image=make_image('shared.png', (106, 53)),
+        )
+        second = Post.objects.create(
+            author=self.user, text='Второй', image=first.image.name,
+        )
+        with mock.patch('posts.thumbnails.submit') as submit:
+            derivatives.prefetch([first, second])
+        submit.assert_called_once_with(
+            ('derivatives', first.image.name),
+            derivatives.build, first.image.name,
+        )
+        self.assertEqual(second.image_derivatives, {})
+
+    def test_concurrent_render_leaves_no_duplicates(self):
+        """Файл, который успел записать другой процесс, не дублируется."""
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=make_image('race.png', (108, 54)),
+        )
+        self.assertTrue(derivatives.build(post.image.name))
+        directory = posixpath.dirname(post.derivatives.first().file.name)
+        before = default_storage.listdir(directory)[1]
+        # Другой процесс дописал файлы после проверки exists.
+        storage = mock.Mock(wraps=default_storage)
+        storage.exists.return_value = False
+        with mock.patch('posts.derivatives.default_storage', storage):
+            derivatives.render(post.image.name)
+        self.assertEqual(default_storage.listdir(directory)[1], before)
+
+    def test_prefetch_uses_one_query(self):
+        """Копии для страницы постов загружаются одним запросом."""
+        for index in range(3):
+            Post.objects.create(
+                author=self.user, text=f'Пост {index}',
+                image=make_image(f'many_{index}.png', (100, 50)),
+            )
+        for post in Post.objects.all():
+            derivatives.build(post.image.name)
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            derivatives.prefetch(posts)
+            for post in posts:
+                self.assertIn(' 100w', derivatives.srcset(post, 'webp'))
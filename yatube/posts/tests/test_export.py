@@ -0,0 +1,144 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO, TextIOWrapper
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import export
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='-'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group if i % 2 else None,
+                 text=f'Пост, «{i}»\nвторая строка')
+            for i in range(7)
+        )
+        cls.posts = list(Post.objects.order_by('id'))
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def test_keyset_reads_in_chunks(self):
+        """Все строки по возрастанию pk, по запросу на кусок."""
+        _, fields = export.DATASETS['posts']
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export.keyset(Post.objects.all(), fields, 3))
+        self.assertEqual(
+            [row[0] for row in rows], [post.pk for post in self.posts]
+        )
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('OFFSET', queries[-1]['sql'])
+
+    def test_keyset_respects_filter(self):
+        queryset = Post.objects.filter(group=self.group)
+        rows = list(export.keyset(queryset, ('id',), 2))
+        self.assertEqual(
+            [row[0] for row in rows],
+            [post.pk for post in self.posts if post.group_id],
+        )
+
+    def test_keyset_rejects_empty_chunks(self):
+        """Кусок меньше одной строки не продвинул бы курсор."""
+        for chunk_size in (0, -1):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    next(export.keyset(Post.objects.all(), ('id',),
+                                       chunk_size))
+
+    def test_jsonl(self):
+        _, fields = export.DATASETS['posts']
+        lines = list(export.export(Post.objects.all(), fields))
+        self.assertEqual(len(lines), 7)
+        record = json.loads(lines[0])
+        self.assertEqual(set(record), set(fields))
+        self.assertEqual(record['text'], self.posts[0].text)
+        self.assertEqual(record['group_id'], None)
+        self.assertEqual(
+            record['pub_date'], self.posts[0].pub_date.isoformat()
+        )
+
+    def test_csv(self):
+        _, fields = export.DATASETS['posts']
+        content = ''.join(export.export(Post.objects.all(), fields, 'csv'))
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], list(fields))
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[1][fields.index('text')], self.posts[0].text)
+
+    def test_command_stdout(self):
+        out = StringIO()
+        call_command('export_data', 'follows', stdout=out)
+        self.assertEqual(
+            json.loads(out.getvalue()),
+            {'id': Follow.objects.get().pk, 'user_id': self.user.pk,
+             'author_id': self.author.pk},
+        )
+
+    def test_command_gzip(self):
+        """Сжатая выгрузка в файл читается gzip."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'comments.csv.gz')
+            call_command(
+                'export_data', 'comments', format='csv', output=path,
+                gzip=True, chunk_size=1,
+            )
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                rows = list(csv.reader(file))
+        self.assertEqual(rows[1][rows[0].index('text')], 'Комментарий')
+        self.assertEqual(len(rows), 2)
+
+    def test_command_gzip_stdout(self):
+        """Сжатая выгрузка идёт в stdout, переданный команде."""
+        out = TextIOWrapper(BytesIO(), encoding='utf-8')
+        call_command('export_data', 'follows', gzip=True, stdout=out)
+        record = json.loads(gzip.decompress(out.buffer.getvalue()))
+        self.assertEqual(record['user_id'], self.user.pk)
+        with self.assertRaises(CommandError):
+            call_command(
+                'export_data', 'follows', gzip=True, stdout=StringIO()
+            )
+
+    def test_command_chunk_size(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'export_data', 'posts', chunk_size=0, stdout=StringIO()
+            )
+
+    def test_admin_action_streams(self):
+        """Действие админки отдаёт выбранные посты потоком."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        selected = [self.posts[1].pk, self.posts[4].pk]
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'export_jsonl', '_selected_action': selected},
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('posts.jsonl', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in content.splitlines()],
+            selected,
+        )
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -13,7 +14,7 @@ from posts.models import Post, Group, User, Comment
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -145,7 +146,11 @@ class PostFormTest(TestCase):
         self.assertEqual(post_with_image.text, form_data['text'])
         self.assertEqual(post_with_image.group.id, form_data['group'])
         self.assertEqual(post_with_image.author, form_data['author'])
-        self.assertEqual(post_with_image.image, 'posts/small.gif')
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(
+            post_with_image.image,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif',
+        )
 
     def test_create_new_comment(self):
         """Тест: после успешной отправки комментарий появляется в БД."""
@@ -0,0 +1,87 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN — SQLite')
+@override_settings(LIMIT=3, COMMENTS_LIMIT=3)
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(8):
+            Post.objects.create(
+                author=cls.author if i % 2 else cls.reader,
+                group=cls.group if i % 3 else None,
+                text=f'Пост {i}',
+            )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for i in range(8):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Коммент {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url, params=None):
+        """Планы всех SELECT страницы: первой и следующей по курсору."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            page = response.context.get('page_obj')
+            if page is None:
+                page = response.context['comments']
+                cursor = {'comments': page.next_cursor}
+            else:
+                cursor = {'cursor': page.next_cursor}
+            self.assertIsNotNone(page.next_cursor)
+            self.client.get(url, cursor)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans[sql] = ' | '.join(row[-1] for row in cursor.fetchall())
+        return plans
+
+    def test_feeds_do_not_sort_in_temp_btree(self):
+        """Ленты и комментарии читаются по индексу без сортировки."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            for sql, plan in self.plans(url).items():
+                with self.subTest(url=url, sql=sql[:200]):
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_lookup_by_author_uses_index(self):
+        """Подписчики автора ищутся по индексу (author, user)."""
+        sql, params = Follow.objects.filter(
+            author=self.author
+        ).values('user').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('follow_author_user_idx', plan)
@@ -0,0 +1,282 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.routers import PIN_COOKIE, SYNC_KEY, mark_synced
+from posts import decorators, feed_cache
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import commit_callbacks
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый текст'
+        )
+        cls.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'TestUser'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        decorators._pending.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_second_anonymous_request_is_cached(self):
+        """Повторный запрос анонима отдаётся из кеша.
+
+        Остаётся только поиск id группы, автора или поста для ключа.
+        """
+        for address in self.addresses:
+            with self.subTest(address=address):
+                first = self.guest_client.get(address)
+                self.assertEqual(first['X-Page-Cache'], 'MISS')
+                with self.assertNumQueries(1 if address != '/' else 0):
+                    second = self.guest_client.get(address)
+                self.assertEqual(second['X-Page-Cache'], 'HIT')
+                self.assertEqual(first.content, second.content)
+
+    def test_authorized_requests_are_not_cached(self):
+        """Страницы авторизованных пользователей не кешируются."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_query_string_is_part_of_key(self):
+        """Разные страницы ленты кешируются отдельно."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'), {'page': 1})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_changes_invalidate_cached_pages(self):
+        """Правка поста, комментарий и подписка сбрасывают кеш."""
+        for address in self.addresses:
+            self.guest_client.get(address)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+                self.assertContains(response, 'Исправленный текст')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий'
+        )
+        response = self.guest_client.get(self.addresses[-1])
+        self.assertContains(response, 'Новый комментарий')
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.guest_client.get(self.addresses[2])
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_versions_bumped_after_commit(self):
+        """Версия, выданная до коммита записи, после коммита не действует.
+
+        Иначе параллельный запрос закешировал бы под ней старые строки.
+        """
+        scopes = (
+            feed_cache.GLOBAL,
+            feed_cache.post_scope(self.post.pk),
+            feed_cache.author_scope(self.reader.pk),
+        )
+        with commit_callbacks(execute=False) as callbacks:
+            with transaction.atomic():
+                Post.objects.get(pk=self.post.pk).save()
+                Comment.objects.create(
+                    post=self.post, author=self.reader, text='Комментарий'
+                )
+                Follow.objects.create(user=self.reader, author=self.user)
+                before_commit = feed_cache.get_version(*scopes)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        after_commit = feed_cache.get_version(*scopes)
+        for old, new in zip(before_commit.split('.'),
+                            after_commit.split('.')):
+            self.assertNotEqual(old, new)
+
+    def test_cache_stats(self):
+        """Статистика попаданий доступна только персоналу."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:cache_stats'))
+        self.assertEqual(response.status_code, 302)
+        self.reader.is_staff = True
+        self.reader.save()
+        response = self.authorized_client.get(reverse('posts:cache_stats'))
+        self.assertEqual(response.json(), {'hits': 1, 'misses': 1})
+
+    @override_settings(PAGE_CACHE_STATS_INTERVAL=3600)
+    def test_cache_stats_buffered(self):
+        """Счётчики не пишутся в кеш на каждый запрос."""
+        decorators.stats()
+        for _ in range(3):
+            self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(cache.get(decorators.HITS, 0), 0)
+        self.assertEqual(decorators.stats(), {'hits': 2, 'misses': 1})
+        self.assertEqual(cache.get(decorators.HITS), 2)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый текст'
+        )
+        cls.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'TestUser'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Совпавший ETag даёт 304 без рендера шаблона."""
+        for client in (self.guest_client, self.authorized_client):
+            for address in self.addresses:
+                with self.subTest(address=address):
+                    # Первый ответ с формой выдаёт CSRF-cookie, она входит
+                    # в ETag авторизованного пользователя.
+                    client.get(address)
+                    etag = client.get(address)['ETag']
+                    response = client.get(address, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_etag_depends_on_viewer(self):
+        """Аноним и пользователь получают разные ETag."""
+        address = reverse('posts:index')
+        self.assertNotEqual(
+            self.guest_client.get(address)['ETag'],
+            self.authorized_client.get(address)['ETag'],
+        )
+
+    def test_changes_invalidate_etag(self):
+        """После правки поста или комментария страница отдаётся целиком."""
+        etags = {
+            address: self.guest_client.get(address)['ETag']
+            for address in self.addresses
+        }
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        for address, etag in etags.items():
+            with self.subTest(address=address):
+                response = self.guest_client.get(
+                    address, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+        address = self.addresses[-1]
+        etag = self.guest_client.get(address)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.guest_client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+# «Реплика» — та же тестовая база. Отставание изображается порядком
+# действий: версия ленты уже увеличена записью, а страница собирается по
+# старым строкам; потом строки догоняют запись.
+@override_settings(DATABASE_REPLICAS=['default'])
+class LaggingReplicaCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.writer, text='Старый текст')
+
+    def setUp(self):
+        cache.clear()
+        mark_synced('default')
+        self.writer_client = Client()
+        self.writer_client.force_login(self.writer)
+
+    def tearDown(self):
+        cache.delete(SYNC_KEY.format('default'))
+
+    def render_from_lagging_replica(self, client):
+        # Запись на основной базе уже увеличила версию...
+        feed_cache.bump_post(self.post)
+        # ...а отставшая реплика отдаёт старый текст.
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, 'Старый текст')
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+
+    def pin(self, client):
+        client.cookies[PIN_COOKIE] = str(int(time.time()) + 10)
+
+    def test_pinned_writer_skips_replica_fragment(self):
+        """Фрагмент ленты с реплики не достаётся писавшему."""
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        self.render_from_lagging_replica(reader)
+        self.pin(self.writer_client)
+        response = self.writer_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_anonymous_page_refreshed_after_sync(self):
+        """Страница с отставшей реплики живёт до её синхронизации."""
+        guest = Client()
+        self.render_from_lagging_replica(guest)
+        pinned = Client()
+        self.pin(pinned)
+        response = pinned.get(reverse('posts:index'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новый текст')
+        cached = guest.get(reverse('posts:index'))
+        self.assertEqual(cached['X-Page-Cache'], 'HIT')
+        cache.set(SYNC_KEY.format('default'), 0, None)
+        response = guest.get(reverse('posts:index'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новый текст')
+
+    def test_etag_changes_with_sync(self):
+        """ETag ответа с реплики меняется после синхронизации."""
+        guest = Client()
+        etag = guest.get(reverse('posts:index'))['ETag']
+        self.assertEqual(
+            guest.get(
+                reverse('posts:index'), HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            304,
+        )
+        cache.set(SYNC_KEY.format('default'), 0, None)
+        self.assertEqual(
+            guest.get(
+                reverse('posts:index'), HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200,
+        )
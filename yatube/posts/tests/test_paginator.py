@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Group, Post
@@ -54,3 +54,75 @@ class PaginatorTests(TestCase):
                 response = (self.authorized_client.get(address + '?page=2'))
                 self.assertEqual(len(response.context['page_obj']),
                                  3, danger_message)
+
+    def test_cursor_pages_views(self):
+        """Views - Курсор ведёт на следующую страницу и обратно"""
+        for address, temp in self.paginate_dict.items():
+            with self.subTest(temp=temp):
+                first = self.authorized_client.get(address).context[
+                    'page_obj'
+                ]
+                self.assertIsNone(first.previous_cursor)
+                second = self.authorized_client.get(
+                    address, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertIsNone(second.next_cursor)
+                back = self.authorized_client.get(
+                    address, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back],
+                    [post.pk for post in first],
+                )
+
+    def test_cursor_last_page(self):
+        """Курсор последней страницы отдаёт самые старые посты"""
+        first = self.authorized_client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        last = self.authorized_client.get(
+            reverse('posts:index'),
+            {'cursor': first.paginator.last_cursor},
+        ).context['page_obj']
+        posts = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(list(last), posts[-10:])
+        self.assertIsNotNone(last.previous_cursor)
+        self.assertIsNone(last.next_cursor)
+        previous = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': last.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(previous), posts[:-10])
+        self.assertIsNotNone(previous.next_cursor)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_cursor_page_runs_no_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        first = self.authorized_client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        paginator = first.paginator
+        with self.assertNumQueries(1):
+            page = paginator.get_cursor_page(first.next_cursor)
+        self.assertEqual(len(page), 3)
+
+    @override_settings(COUNT_CAP=10)
+    def test_feed_shows_ready_count(self):
+        """Лента показывает число постов, только если оно уже известно."""
+        response = self.authorized_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertContains(response, 'Всего постов: 13')
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'page': 2}
+        )
+        self.assertContains(response, 'Всего постов: 10+')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Всего постов')
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            author = User.objects.create_user(username=f'user_{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author, group=cls.group, text=f'Пост {i}'
+            )
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Текст {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feed_pages_query_count(self):
+        """Число запросов страницы ленты не зависит от числа постов.
+
+        Для анонима сюда входит поиск id группы или автора для ключа
+        кеша страницы.
+        """
+        pages = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}): 3,
+            reverse('posts:profile', kwargs={'username': 'author'}): 3,
+        }
+        for address, queries in pages.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    response = self.guest_client.get(address)
+                self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_follow_index_query_count(self):
+        """Лента подписок рендерится фиксированным числом запросов."""
+        with self.assertNumQueries(4):
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_post_detail_query_count(self):
+        """Страница поста не делает запрос на каждый комментарий."""
+        post = Post.objects.filter(author=self.author).first()
+        for i in range(5):
+            post.comments.create(author=self.reader, text=f'Коммент {i}')
+        with self.assertNumQueries(3):
+            self.guest_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id})
+            )
@@ -0,0 +1,183 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class SearchBackendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.weak = Post.objects.create(
+            author=cls.author,
+            text='Заметка о питоне среди многих других слов про разное',
+        )
+        cls.strong = Post.objects.create(
+            author=cls.author, group=cls.group, text='Питон, питон и питон',
+        )
+        cls.foreign = Post.objects.create(
+            author=cls.other, text='Питоны бывают разные',
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.other, text='Совсем про другое',
+        )
+
+    def found(self, query, queryset=None):
+        return list(search.get_backend().search(query, queryset))
+
+    def test_ranked_prefix_search(self):
+        """Находятся словоформы по префиксу, лучшие совпадения выше."""
+        found = self.found('питон')
+        self.assertEqual(found[0], self.strong)
+        self.assertEqual(
+            set(found), {self.strong, self.weak, self.foreign}
+        )
+
+    def test_all_terms_required(self):
+        """Пост должен содержать все слова запроса."""
+        self.assertEqual(self.found('питоны разные'), [self.foreign])
+        self.assertEqual(self.found('"питон" OR другое'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Сигналы Post обновляют индекс."""
+        post = Post.objects.get(pk=self.unrelated.pk)
+        post.text = 'Теперь и тут питон'
+        post.save()
+        self.assertIn(post, self.found('питон'))
+        self.assertEqual(self.found('другое'), [])
+        post.delete()
+        self.assertNotIn(self.unrelated, self.found('питон'))
+
+    def test_rebuild(self):
+        """Индекс строится заново, в том числе для правок в обход save()."""
+        Post.objects.filter(pk=self.unrelated.pk).update(text='Удав')
+        search.get_backend().rebuild()
+        self.assertEqual(self.found('удав'), [self.unrelated])
+
+    @override_settings(POST_SEARCH_BACKEND='posts.search.SimpleSearchBackend')
+    def test_simple_backend(self):
+        """Запасной бэкенд ищет без индекса."""
+        self.assertEqual(self.found('питоны разные'), [self.foreign])
+
+
+@override_settings(LIMIT=2)
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author if i % 2 else cls.other,
+                group=cls.group if i % 3 == 0 else None,
+                text='питон ' * (i + 1) + 'слово ' * (5 - i),
+            )
+            for i in range(5)
+        ]
+
+    def test_empty_query(self):
+        """Без запроса страница показывает только форму."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_cursor_pages_cover_ranked_results(self):
+        """Курсорные страницы выдачи идут по рангу без повторов."""
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'питон'})
+        seen = list(response.context['page_obj'])
+        while response.context['page_obj'].next_cursor:
+            self.assertContains(response, 'q=%D0%BF%D0%B8%D1%82%D0%BE%D0%BD&')
+            response = self.client.get(url, {
+                'q': 'питон',
+                'cursor': response.context['page_obj'].next_cursor,
+            })
+            seen.extend(response.context['page_obj'])
+        expected = list(search.get_backend().search('питон'))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 5)
+
+    def test_filters(self):
+        """Выдачу можно сузить по группе и автору."""
+        response = self.client.get(reverse('posts:search'), {
+            'q': 'питон', 'group': 'group', 'author': 'author',
+        })
+        expected = [
+            post for post in self.posts
+            if post.group_id and post.author == self.author
+        ]
+        self.assertEqual(list(response.context['page_obj']), expected)
+
+
+class ManyMatchesSearchTest(TestCase):
+    """Выдача, где общее слово встречается в тысячах постов."""
+
+    matches = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'питон {i} ' + 'слово ' * (i % 7))
+            for i in range(cls.matches)
+        )
+        Post.objects.bulk_create(
+            Post(author=author, text=f'удав {i}') for i in range(500)
+        )
+        search.get_backend().rebuild()
+
+    def paginator(self):
+        backend = search.get_backend()
+        return CursorPaginator(
+            backend.search('питон', Post.objects.for_feed()), 10,
+            ordering=backend.ordering, count_cap=1000,
+        )
+
+    def test_index_matched_once(self):
+        """MATCH выполняется один раз на запрос, а не на каждую строку."""
+        paginator = self.paginator()
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_cursor_page()
+            paginator.count
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertEqual(query['sql'].count('MATCH'), 1)
+        sql, params = paginator.object_list.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertNotIn('CORRELATED', plan)
+
+    def test_pages_follow_rank(self):
+        """Курсорные страницы совпадают с порядком bm25 самого индекса."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM posts_post_fts WHERE posts_post_fts '
+                'MATCH %s ORDER BY rank, rowid DESC LIMIT 50',
+                ['"питон"*'],
+            )
+            expected = [row[0] for row in cursor.fetchall()]
+        paginator = self.paginator()
+        seen = []
+        cursor = None
+        for _ in range(5):
+            page = paginator.get_cursor_page(cursor)
+            seen.extend(post.pk for post in page)
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(paginator.count, 1001)
+        self.assertEqual(paginator.count_display, '1\xa0000+')
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import feed_cache
+from posts.datagen import make_images, render_image
+from posts.models import Comment, Follow, Group, MediaBlob, Post
+from posts.storage import post_images
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        out = StringIO()
+        call_command(
+            'seed', users=6, groups=2, posts=30, comments=40, follows=10,
+            workers=1, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_rows_created_and_reported(self):
+        """Команда создаёт объекты и печатает скорость по этапам."""
+        out = self.seed()
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 10)
+        for stage in ('users', 'posts', 'comments', 'timeline'):
+            self.assertIn(stage, out)
+        self.assertIn('строк/с', out)
+
+    def test_posts_get_images(self):
+        """Посты делят нарисованные картинки, файлы лежат в хранилище."""
+        self.seed(images=3)
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 3)
+        for name in names:
+            self.assertTrue(post_images.exists(name))
+            self.assertEqual(
+                MediaBlob.objects.get(name=name).ref_count,
+                Post.objects.filter(image=name).count(),
+            )
+
+    def test_feed_versions_bumped(self):
+        """Закешированные ленты не переживают наполнение базы."""
+        version = feed_cache.get_version(feed_cache.GLOBAL)
+        self.seed()
+        self.assertNotEqual(
+            feed_cache.get_version(feed_cache.GLOBAL), version
+        )
+
+    def test_failed_run_discards_images(self):
+        """Если генерация упала, нарисованные картинки удаляются."""
+        Group.objects.create(title='Занято', slug='clash-0')
+
+        def files():
+            return {
+                os.path.join(root, name)
+                for root, _, names in os.walk(TEMP_MEDIA_ROOT)
+                for name in names
+            }
+
+        before = files()
+        with self.assertRaises(IntegrityError):
+            self.seed(images=2, prefix='clash', seed=7)
+        self.assertEqual(files(), before)
+
+    def test_prefix_taken(self):
+        """Повторный запуск с тем же префиксом не ломает уникальность."""
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(prefix='more')
+        self.assertEqual(User.objects.count(), 12)
+
+    def test_images_same_with_processes(self):
+        """В пуле процессов рисуются те же картинки, что и в одном."""
+        self.assertEqual(
+            make_images(4, seed=2, width=40, height=30, workers=2),
+            make_images(4, seed=2, width=40, height=30),
+        )
+
+    def test_render_image(self):
+        data = render_image(5, 40, 30)
+        self.assertEqual(data, render_image(5, 40, 30))
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (40, 30)))
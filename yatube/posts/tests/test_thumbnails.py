@@ -0,0 +1,165 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+import sorl
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import sorl_backend, thumbnails
+from posts.models import Post, PostImage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png'):
+    buffer = BytesIO()
+    # Разный цвет для разных имён: одинаковые картинки хранятся одним файлом.
+    color = tuple(hashlib.md5(name.encode()).digest()[:3])
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_url_falls_back_to_original(self):
+        """Пока миниатюры нет, отдаётся оригинал, затем миниатюра."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image('first.png')
+        )
+        self.assertEqual(thumbnails.url(post.image, 'feed'), post.image.url)
+        thumbnail_url = thumbnails.url(post.image, 'feed')
+        self.assertNotEqual(thumbnail_url, post.image.url)
+        self.assertTrue(thumbnail_url.startswith(settings.MEDIA_URL))
+
+    def test_first_views_generate_thumbnails(self):
+        """Загрузка не генерирует миниатюры, первый показ поста — да."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': make_image('second.png')},
+        )
+        post = Post.objects.get(text='Текст')
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNone(thumbnails.backend.lookup(
+                    post.image, settings.POST_THUMBNAILS[size], upscale=True
+                ))
+        self.authorized_client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.authorized_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNotNone(thumbnails.backend.lookup(
+                    post.image, settings.POST_THUMBNAILS[size], upscale=True
+                ))
+
+    def test_warm_thumbnails_command(self):
+        """warm_thumbnails создаёт миниатюры и копии существующих постов."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image('third.png')
+        )
+        # Как у постов, созданных в обход save (seed).
+        post.derivatives.all().delete()
+        call_command('warm_thumbnails', stdout=StringIO())
+        self.assertNotEqual(thumbnails.url(post.image, 'detail'),
+                            post.image.url)
+        self.assertTrue(post.derivatives.exists())
+
+    def test_cached_page_links_pending_thumbnail(self):
+        """Закешированная страница ведёт к миниатюре, а не к оригиналу."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image('late.png')
+        )
+        cache.clear()
+        response = Client().get(reverse('posts:index'))
+        pending_url = reverse('posts:post_thumbnail', args=(post.pk, 'feed'))
+        self.assertContains(response, f'src="{pending_url}"')
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        response = self.client.get(pending_url)
+        self.assertRedirects(
+            response, thumbnails.url(post.image, 'feed'),
+            fetch_redirect_response=False,
+        )
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_pending_thumbnail_unknown_size(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image('size.png')
+        )
+        response = self.client.get(
+            reverse('posts:post_thumbnail', args=(post.pk, 'huge'))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_prefetch_skipped_on_fragment_hit(self):
+        """Из закешированного фрагмента картинки страницы не ищутся."""
+        Post.objects.create(
+            author=self.user, text='Текст', image=make_image('hit.png')
+        )
+        call_command('warm_thumbnails', stdout=StringIO())
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse('posts:index'))
+        for query in queries:
+            self.assertNotIn(PostImage._meta.db_table, query['sql'])
+
+    def test_prefetch_resolves_page_in_one_query(self):
+        """Миниатюры страницы находятся одним запросом к key-value store."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Текст {i}',
+                image=make_image(f'page_{i}.png'),
+            )
+            for i in range(5)
+        ]
+        call_command('warm_thumbnails', stdout=StringIO())
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts, 'feed')
+        for post in posts:
+            with self.subTest(post=post.text):
+                self.assertEqual(
+                    post.thumbnail_urls['feed'],
+                    thumbnails.url(post.image, 'feed'),
+                )
+                self.assertNotEqual(post.thumbnail_urls['feed'],
+                                    post.image.url)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts, 'feed')
+
+
+class SorlVersionTest(TestCase):
+    def test_pinned_version_installed(self):
+        """``sorl_backend`` проверен только с закреплённой версией sorl."""
+        self.assertEqual(sorl.__version__, sorl_backend.SORL_VERSION)
@@ -0,0 +1,209 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, Profile, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.author.username})
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post
+        ).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.stranger).exists()
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        Follow.objects.create(user=self.reader, author=self.stranger)
+        Post.objects.create(author=self.stranger, text='Пост незнакомца')
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author.username})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, post__author=self.author
+        ).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__author=self.stranger
+        ).exists())
+
+    def test_follow_index_reads_timeline(self):
+        """Лента подписок строится по материализованной ленте."""
+        self.follow()
+        TimelineEntry.objects.filter(post=self.old_post).delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_follow_index_pages_by_timeline_index(self):
+        """Страница по курсору читается из TimelineEntry без JOIN к ней."""
+        self.follow()
+        posts = [self.old_post] + [
+            Post.objects.create(author=self.author, text=f'{i}')
+            for i in range(12)
+        ]
+        first = self.authorized_client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        table = TimelineEntry._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            second = self.authorized_client.get(
+                reverse('posts:follow_index'), {'cursor': first.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        page_sql = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and f'FROM "{table}"' in query['sql']
+        ]
+        self.assertEqual(len(page_sql), 1)
+        self.assertNotIn(f'JOIN "{table}"', page_sql[0])
+
+
+@override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_celebrity_posts_are_not_fanned_out(self):
+        """Пост популярного автора не раскладывается по лентам."""
+        post = Post.objects.create(author=self.celebrity, text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_follow_index_merges_celebrity_posts(self):
+        """Лента подписок сливает материализованную ленту и популярных."""
+        posts = []
+        for i in range(8):
+            author = self.celebrity if i % 2 else self.author
+            posts.append(Post.objects.create(author=author, text=f'{i}'))
+        Post.objects.create(author=self.fan, text='Чужой пост')
+        response = self.authorized_client.get(
+            reverse('posts:follow_index')
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), posts[::-1])
+
+    def test_follow_index_merged_pages(self):
+        """Курсор листает слитую ленту без повторов и пропусков."""
+        posts = []
+        for i in range(15):
+            author = self.celebrity if i % 3 else self.author
+            posts.append(Post.objects.create(author=author, text=f'{i}'))
+        first = self.authorized_client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        second = self.authorized_client.get(
+            reverse('posts:follow_index'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        legacy = self.authorized_client.get(
+            reverse('posts:follow_index'), {'page': 2}
+        ).context['page_obj']
+        self.assertEqual(list(legacy), list(second))
+
+    def test_dropping_below_threshold_restores_posts(self):
+        """Пост, вышедший выше порога, попадает в ленты после спада."""
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=self.reader, author=newcomer)
+        first = Post.objects.create(author=newcomer, text='Первый')
+        Follow.objects.create(user=self.fan, author=newcomer)
+        second = Post.objects.create(author=newcomer, text='Второй')
+        self.assertFalse(TimelineEntry.objects.filter(post=second).exists())
+        Follow.objects.filter(user=self.fan, author=newcomer).delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader, post__author=newcomer
+            ).values_list('post_id', flat=True)),
+            {first.pk, second.pk},
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.fan).exists())
+
+    def test_follower_from_celebrity_period_backfilled(self):
+        """Подписавшийся выше порога получает старые посты после спада."""
+        old = Post.objects.create(author=self.celebrity, text='Старый')
+        late = User.objects.create_user(username='late')
+        Follow.objects.create(user=late, author=self.celebrity)
+        self.assertFalse(TimelineEntry.objects.filter(user=late).exists())
+        Follow.objects.filter(author=self.celebrity).exclude(
+            user=late
+        ).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=late, post=old).exists()
+        )
+
+    @override_settings(TIMELINE_BACKFILL_POSTS=2)
+    def test_dropping_below_threshold_refills_recent_posts(self):
+        """После спада в ленты досыпаются только свежие посты автора."""
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=self.reader, author=newcomer)
+        Follow.objects.create(user=self.fan, author=newcomer)
+        posts = [
+            Post.objects.create(author=newcomer, text=f'{i}')
+            for i in range(4)
+        ]
+        Follow.objects.filter(user=self.fan, author=newcomer).delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader, post__author=newcomer
+            ).values_list('post_id', flat=True)),
+            {post.pk for post in posts[-2:]},
+        )
+
+    def test_celebrity_decided_by_profile_counter(self):
+        """Порог сравнивается с Profile.follower_count без COUNT(*)."""
+        Profile.objects.filter(user=self.author).update(follower_count=100)
+        self.assertTrue(timeline.is_celebrity(self.author.pk))
+        self.assertEqual(
+            set(timeline.celebrity_ids(self.reader)),
+            {self.author.pk, self.celebrity.pk},
+        )
+        with self.assertNumQueries(1):
+            timeline.is_celebrity(self.celebrity.pk)
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+from posts.uploads import BoundedFileUploadHandler
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+GPS_INFO = 0x8825
+
+
+def make_upload(name, size, image_format='PNG', exif=None):
+    buffer = BytesIO()
+    image = Image.effect_noise(size, 64).convert('RGB')
+    options = {'exif': exif.tobytes()} if exif is not None else {}
+    if image_format == 'MPO':
+        # Как у камер: второй кадр (превью) в MP-расширении.
+        options.update(save_all=True, append_images=[image.copy()])
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(),
+        content_type=Image.MIME[image_format],
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, upload):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': upload},
+        )
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_handler_stops_writing_after_limit(self):
+        """Обработчик загрузки не пишет на диск больше предела."""
+        handler = BoundedFileUploadHandler()
+        handler.new_file('image', 'big.png', 'image/png', None)
+        for start in range(0, 3000, 500):
+            handler.receive_data_chunk(b'x' * 500, start)
+        upload = handler.file_complete(3000)
+        self.assertEqual(upload.size, 3000)
+        self.assertLessEqual(
+            os.path.getsize(upload.temporary_file_path()), 1000
+        )
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_oversized_upload_rejected(self):
+        """Файл больше предела отклоняется с понятной ошибкой."""
+        response = self.create_post(make_upload('big.png', (100, 100)))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1000\xa0байт.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше предела по пикселям отклоняется."""
+        response = self.create_post(make_upload('wide.png', (20, 20)))
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'too_many_pixels'
+        ))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_DECODED_PIXELS=100)
+    def test_lower_limit_without_draft_decoding(self):
+        """Не-JPEG декодируются целиком, и предел для них ниже."""
+        response = self.create_post(make_upload('wide.png', (20, 20)))
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'too_many_pixels'
+        ))
+        self.assertFalse(Post.objects.exists())
+        self.create_post(make_upload('wide.jpg', (20, 20), 'JPEG'))
+        self.assertTrue(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_exif_stripped_and_downscaled(self):
+        """EXIF убирается с учётом поворота, оригинал уменьшается."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        self.create_post(make_upload('camera.jpg', (200, 100), 'JPEG', exif))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with post.image.open() as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (25, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_mpo_reencoded_as_jpeg(self):
+        """Снимок камеры в MPO тоже теряет EXIF и уменьшается."""
+        exif = Image.Exif()
+        exif[MAKE] = 'Camera'
+        exif[GPS_INFO] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+        upload = make_upload('phone.jpg', (200, 100), 'MPO', exif)
+        self.assertEqual(Image.open(upload).format, 'MPO')
+        upload.seek(0)
+        self.create_post(upload)
+        post = Post.objects.get()
+        with post.image.open() as file:
+            image = Image.open(file)
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 25))
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_kept_as_is(self):
+        """Небольшая картинка без EXIF сохраняется без пересжатия."""
+        upload = make_upload('small.png', (30, 20))
+        content = upload.read()
+        upload.seek(0)
+        self.create_post(upload)
+        with Post.objects.get().image.open() as file:
+            self.assertEqual(file.read(), content)
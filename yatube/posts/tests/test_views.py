@@ -217,13 +217,41 @@ class PostsViewsTest(TestCase):
             return self.quest_client.get(reverse('posts:index'))
 
         response_primary = response().content
-        post_del_cache.delete()
+        Post.objects.filter(pk=post_del_cache.pk).update(text='Без сигналов')
         response_secondary = response().content
         self.assertEqual(response_primary, response_secondary)
         cache.clear()
         response_cache_clear = response().content
         self.assertNotEqual(response_secondary, response_cache_clear)
 
+    def test_cache_invalidated_by_post_changes(self):
+        """Изменение поста сразу сбрасывает кеш лент."""
+        cache.clear()
+        post = Post.objects.create(
+            text='Текст для проверки',
+            author=self.user,
+            group=self.group,
+        )
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                self.quest_client.get(address)
+        post.text = 'Исправленный текст'
+        post.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.quest_client.get(address)
+                self.assertContains(response, 'Исправленный текст')
+        post.delete()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.quest_client.get(address)
+                self.assertNotContains(response, 'Исправленный текст')
+
     def test_create_follow_authorized(self):
         """Тест создания подписок авторизованным пользователем."""
         self.authorized_client.get(
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def commit_callbacks(using=DEFAULT_DB_ALIAS, execute=True):
+    """``TestCase.captureOnCommitCallbacks`` из Django 3.2.
+
+    ``TestCase`` не коммитит транзакцию теста, и ``on_commit`` без этого
+    не срабатывают: блок изображает коммит записей внутри него.
+    """
+    callbacks = []
+    start = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        run_on_commit = connections[using].run_on_commit[start:]
+        callbacks[:] = [func for _, func in run_on_commit]
+        if execute:
+            for callback in callbacks:
+                callback()
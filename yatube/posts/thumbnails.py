@@ -0,0 +1,135 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Шаблоны больше не вызывают sorl ``{% thumbnail %}`` на рендере: тег
+``post_thumbnail_url`` берёт готовую миниатюру из key-value store sorl,
+а если её ещё нет, ставит генерацию в пул потоков и отдаёт ссылку на
+оригинал. Потоки пула только пишут файлы миниатюр и не трогают базу;
+запись в key-value store делает запрос, который первым увидит файл.
+Страницы с постами кешируются, поэтому вместо оригинала они ссылаются на
+``posts:post_thumbnail``: этот адрес перенаправляет на миниатюру, как
+только она готова, и закешированная страница не привязана к оригиналу.
+Загрузка картинки генерацию не запускает: после создания и правки поста
+пользователь сразу попадает на страницу с ним, её рендер и ставит задачу.
+
+Для страницы ленты ``prefetch`` находит миниатюры всех постов одним
+обращением к кешу и одним запросом к таблице key-value store. Всё, что
+опирается на внутренности sorl, собрано в ``sorl_backend``.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import reverse
+
+from .sorl_backend import Backend
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+backend = Backend()
+
+
+def _geometry(size):
+    return settings.POST_THUMBNAILS[size]
+
+
+def generate(image, size):
+    try:
+        backend.generate(image, _geometry(size), upscale=True)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', image.name)
+
+
+def _run(key, func, args):
+    try:
+        func(*args)
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def submit(key, func, *args):
+    """Выполнить ``func(*args)`` в пуле, если задача ``key`` ещё не в нём."""
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    _get_executor().submit(_run, key, func, args)
+
+
+def schedule(image, size):
+    """Поставить генерацию миниатюры в пул (без повторов в очереди)."""
+    if not settings.THUMBNAIL_WORKERS:
+        generate(image, size)
+        return
+    submit((image.name, size), generate, image, size)
+
+
+def url(image, size):
+    """Ссылка на миниатюру; пока её нет — на оригинал."""
+    if not image:
+        return ''
+    try:
+        thumbnail = backend.lookup(image, _geometry(size), upscale=True)
+    except Exception:
+        logger.exception('Не удалось найти миниатюру %s', image.name)
+        return image.url
+    if thumbnail is not None:
+        return thumbnail.url
+    schedule(image, size)
+    return image.url
+
+
+def post_url(post, size):
+    """Ссылка на миниатюру для страницы, которая может попасть в кеш.
+
+    Пока миниатюры нет — ссылка на ``posts:post_thumbnail``, а не на
+    оригинал.
+    """
+    if not post.image:
+        return ''
+    ready = url(post.image, size)
+    if ready != post.image.url:
+        return ready
+    return reverse('posts:post_thumbnail', args=(post.pk, size))
+
+
+def prefetch(posts, size):
+    """Найти миниатюры размера ``size`` для страницы постов разом.
+
+    Ссылки кладутся в ``post.thumbnail_urls[size]``; их читает тег
+    ``post_thumbnail_url``. Недостающие миниатюры обрабатываются как в
+    ``post_url()``.
+    """
+    images = []
+    for post in posts:
+        if not hasattr(post, 'thumbnail_urls'):
+            post.thumbnail_urls = {}
+        if post.image:
+            images.append(post)
+        else:
+            post.thumbnail_urls[size] = ''
+    found = backend.lookup_many(
+        [post.image for post in images], _geometry(size), upscale=True
+    )
+    for index, post in enumerate(images):
+        if index in found:
+            post.thumbnail_urls[size] = found[index].url
+        else:
+            post.thumbnail_urls[size] = post_url(post, size)
+    return posts
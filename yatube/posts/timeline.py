@@ -0,0 +1,131 @@
+"""Лента подписок: гибрид fan-out on write и fan-out on read.
+
+Пост обычного автора раскладывается в ``TimelineEntry`` всех его
+подписчиков, поэтому ``follow_index`` читает готовую ленту пользователя.
+Посты авторов, у которых подписчиков не меньше
+``settings.TIMELINE_FANOUT_THRESHOLD``, не раскладываются: они
+подмешиваются при чтении k-way merge'ем их свежих постов.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _insert_from_follows(author_id, user_id=None):
+    """Разложить свежие посты автора по лентам подписчиков одним
+    INSERT ... SELECT.
+
+    Берутся только ``settings.TIMELINE_BACKFILL_POSTS`` последних постов:
+    старые остаются в профиле автора. Без ``user_id`` — по лентам всех
+    подписчиков. Уже разложенные пары пропускаются.
+    """
+    ops = connection.ops
+    entries = TimelineEntry._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    condition = 'f.author_id = %s'
+    params = [author_id]
+    if user_id is not None:
+        condition += ' AND f.user_id = %s'
+        params.append(user_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} {entries} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follows} f '
+            f'JOIN {posts} p ON p.author_id = f.author_id '
+            f'WHERE {condition} AND p.id IN ('
+            f'SELECT id FROM {posts} WHERE author_id = %s '
+            f'ORDER BY pub_date DESC, id DESC LIMIT %s) '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params + [author_id, settings.TIMELINE_BACKFILL_POSTS],
+        )
+
+
+def follower_count(author_id):
+    """Число подписчиков из денормализованного ``Profile.follower_count``."""
+    count = Profile.objects.filter(user_id=author_id).values_list(
+        'follower_count', flat=True
+    ).first()
+    return count or 0
+
+
+def is_celebrity(author_id):
+    """Автор читается при чтении ленты, а не раскладывается при записи."""
+    return follower_count(author_id) >= settings.TIMELINE_FANOUT_THRESHOLD
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, которых подмешивают при чтении."""
+    return Profile.objects.filter(
+        user_id__in=Follow.objects.filter(user=user).values('author_id'),
+        follower_count__gte=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).values_list('user_id', flat=True)
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту подписчика уже опубликованные посты автора."""
+    if is_celebrity(author_id):
+        return
+    _insert_from_follows(author_id, user_id)
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты подписчика посты автора после отписки.
+
+    Если автор этой отпиской опустился ниже порога, его посты снова
+    раскладываются при записи, поэтому в ленты оставшихся подписчиков
+    досыпаются посты, вышедшие, пока он читался при чтении, и старые
+    посты для тех, кто подписался в это время. Подписчиков у автора
+    меньше порога, постов на каждого — не больше
+    ``TIMELINE_BACKFILL_POSTS``, так что запрос ограничен.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+    if follower_count(author_id) == settings.TIMELINE_FANOUT_THRESHOLD - 1:
+        _insert_from_follows(author_id)
+
+
+def feed(user):
+    """Лента подписок пользователя для ``MergingCursorPaginator``.
+
+    Возвращает объединённый queryset и список источников для слияния:
+    материализованную ленту и посты каждого «популярного» автора.
+    """
+    posts = Post.objects.for_feed()
+    celebrities = list(celebrity_ids(user))
+    entries = TimelineEntry.objects.filter(user=user)
+    # Ленту читаем из TimelineEntry в порядке её индекса (user, pub_date,
+    # post): pub_date и post_id записи совпадают с ключом сортировки
+    # постов, а сами посты приходят через select_related.
+    sources = [(entries.for_feed(), ('-pub_date', '-post_id'), 'post')]
+    sources += [posts.filter(author_id=author) for author in celebrities]
+    object_list = posts.filter(
+        Q(id__in=entries.values('post_id')) | Q(author_id__in=celebrities)
+    )
+    return object_list, sources
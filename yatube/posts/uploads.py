@@ -0,0 +1,113 @@
+"""Приём картинок постов с ограниченным расходом памяти.
+
+``BoundedFileUploadHandler`` пишет загрузку сразу во временный файл на
+диске и перестаёт писать, как только она превысила
+``POST_IMAGE_MAX_UPLOAD_SIZE``: размер такого файла остаётся настоящим, и
+форма отклоняет его, не открывая (``check_size``). ``check_pixels``
+смотрит только заголовок картинки, а ``process_image`` убирает EXIF и уменьшает
+слишком большие оригиналы до ``POST_IMAGE_MAX_SIDE``, декодируя JPEG
+сразу в уменьшенном масштабе (``Image.draft``). Остальные форматы так не
+умеют, поэтому их размер ограничен ``POST_IMAGE_MAX_DECODED_PIXELS``.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, которые можно пересохранить без потери анимации и т. п.
+REENCODED_FORMATS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+# Под каким форматом пересохранять: MPO (JPEG камер и телефонов с
+# MP-расширениями) сохраняется первым кадром в обычный JPEG.
+SAVED_AS = {'MPO': 'JPEG'}
+# Форматы, которые Pillow умеет декодировать сразу в уменьшенном масштабе.
+DRAFT_FORMATS = {'JPEG', 'MPO'}
+
+
+class BoundedFileUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка во временный файл, обрезанная после предела размера."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.file.write(raw_data)
+
+
+def is_too_large(upload):
+    return upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE
+
+
+def check_size(upload):
+    """Отклонить файл больше ``POST_IMAGE_MAX_UPLOAD_SIZE``, не открывая."""
+    if is_too_large(upload):
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE),
+            },
+        )
+
+
+def check_pixels(upload):
+    """Отклонить картинку больше ``POST_IMAGE_MAX_PIXELS``.
+
+    Размер берётся из заголовка, который уже прочитал ``forms.ImageField``.
+    Уменьшенное декодирование (``Image.draft``) есть только у JPEG,
+    остальные форматы декодируются целиком, поэтому для них предел
+    ниже — ``POST_IMAGE_MAX_DECODED_PIXELS``.
+    """
+    width, height = upload.image.size
+    limit = settings.POST_IMAGE_MAX_PIXELS
+    if upload.image.format not in DRAFT_FORMATS:
+        limit = min(limit, settings.POST_IMAGE_MAX_DECODED_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': f'{limit / 10 ** 6:g}'},
+        )
+
+
+def _source(upload):
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload
+
+
+def process_image(upload):
+    """Убрать EXIF и уменьшить картинку до ``POST_IMAGE_MAX_SIDE``.
+
+    Результат пишется в тот же временный файл загрузки. Картинки
+    форматов вне ``REENCODED_FORMATS`` и уже подходящие картинки без
+    EXIF не трогаются.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    with Image.open(_source(upload)) as original:
+        image_format = SAVED_AS.get(original.format, original.format)
+        options = REENCODED_FORMATS.get(image_format)
+        too_large = max(original.size) > max_side
+        if options is None or not (too_large or original.info.get('exif')):
+            return upload
+        icc_profile = original.info.get('icc_profile')
+        # Для JPEG декодер сразу отдаёт картинку в 1/2, 1/4 или 1/8 размера.
+        original.draft(original.mode, (max_side, max_side))
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if icc_profile:
+        options = dict(options, icc_profile=icc_profile)
+    upload.seek(0)
+    upload.truncate()
+    image.save(upload.file, image_format, **options)
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
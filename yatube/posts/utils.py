@@ -0,0 +1,14 @@
+from django.conf import settings
+
+from .paginators import CursorPaginator
+
+
+def paginate(request, queryset, per_page=None,
+             paginator_class=CursorPaginator, **kwargs):
+    """Страница ленты: по курсору ``?cursor=``, либо по старому ``?page=``."""
+    paginator = paginator_class(
+        queryset, per_page or settings.LIMIT, **kwargs
+    )
+    if 'page' in request.GET and 'cursor' not in request.GET:
+        return paginator.get_page(request.GET.get('page'))
+    return paginator.get_cursor_page(request.GET.get('cursor'))
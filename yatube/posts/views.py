@@ -1,46 +1,99 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from .models import Comment, Post, Group, User, Follow
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.db import transaction
+from django.views.decorators.cache import never_cache
 
+from core.routers import replica_reads
 from .forms import PostForm, CommentForm
+from . import (counters, decorators, derivatives, feed_cache, thumbnails,
+               timeline)
+from .decorators import anonymous_page_cache, feed_etag
+from .paginators import CursorPaginator, MergingCursorPaginator
+from .search import get_backend as get_search_backend
+from .utils import paginate
 
 
+def _index_scopes(request):
+    return [feed_cache.GLOBAL]
+
+
+def _group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [feed_cache.group_scope(group_id)]
+
+
+def _profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [feed_cache.author_scope(author_id)]
+
+
+def _post_scopes(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [feed_cache.post_scope(post_id), feed_cache.author_scope(author_id)]
+
+
+@replica_reads
+@feed_etag(_index_scopes)
+@anonymous_page_cache(_index_scopes)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list, count_cap=settings.COUNT_CAP)
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_cache.get_version(feed_cache.GLOBAL),
     }
     return render(request, template, context)
 
 
+@replica_reads
+@feed_etag(_group_scopes)
+@anonymous_page_cache(_group_scopes)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group.all()
-    paginator = Paginator(posts, settings.LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.group.for_feed()
+    page_obj = paginate(request, posts, count=group.post_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': feed_cache.get_version(
+            feed_cache.group_scope(group.id)
+        ),
     }
     return render(request, template, context)
 
 
+@replica_reads
+@feed_etag(_profile_scopes)
+@anonymous_page_cache(_profile_scopes)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    post_count = author_posts.count()
-    paginator = Paginator(author_posts, settings.LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    author_posts = author.posts.for_feed()
+    post_count = counters.profile_of(author).post_count
+    page_obj = paginate(request, author_posts, count=post_count)
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user.id,
@@ -53,17 +106,39 @@ def profile(request, username):
         'post_count': post_count,
         'page_obj': page_obj,
         'following': following,
+        'feed_version': feed_cache.get_version(
+            feed_cache.author_scope(author.id)
+        ),
     }
     return render(request, template, context)
 
 
+def _comments_page(post_id, cursor):
+    """Страница комментариев поста по курсору на ``created``."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_LIMIT, ordering=('-created', '-id')
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+@replica_reads
+@feed_etag(_post_scopes)
+@anonymous_page_cache(_post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author_posts = Post.objects.filter(author=post.author).count()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__profile'),
+        pk=post_id,
+    )
+    author_posts = counters.profile_of(post.author).post_count
+    thumbnails.prefetch([post], 'detail')
+    derivatives.prefetch([post])
     group_name = post.group
     form = CommentForm()
     template = 'posts/post_detail.html'
-    comments = post.comments.filter(post=post_id)
+    comments = _comments_page(post.id, request.GET.get('comments'))
     context = {
         'title': group_name,
         'post': post,
@@ -74,6 +149,75 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@replica_reads
+@feed_etag(_post_scopes)
+@anonymous_page_cache(_post_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для подгрузки на странице поста."""
+    comments = _comments_page(post_id, request.GET.get('cursor'))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        return JsonResponse({'error': 'Пост не найден.'}, status=404)
+    next_url = None
+    if comments.next_cursor:
+        next_url = '{}?{}'.format(
+            reverse('posts:post_comments', args=[post_id]),
+            urlencode({'cursor': comments.next_cursor}),
+        )
+    return JsonResponse({
+        'html': render_to_string(
+            'posts/includes/comment_list.html', {'comments': comments}
+        ),
+        'next_cursor': comments.next_cursor,
+        'next_url': next_url,
+    })
+
+
+@never_cache
+def post_thumbnail(request, post_id, size):
+    """Миниатюра картинки поста для закешированных страниц.
+
+    Пока миниатюры нет, перенаправляет на оригинал, затем на миниатюру.
+    """
+    if size not in settings.POST_THUMBNAILS:
+        raise Http404
+    post = get_object_or_404(Post.objects.only('id', 'image'), pk=post_id)
+    if not post.image:
+        raise Http404
+    return redirect(thumbnails.url(post.image, size))
+
+
+@replica_reads
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    filters = {
+        'group': request.GET.get('group', '').strip(),
+        'author': request.GET.get('author', '').strip(),
+    }
+    page_obj = None
+    if query:
+        posts = Post.objects.for_feed()
+        if filters['group']:
+            posts = posts.filter(group__slug=filters['group'])
+        if filters['author']:
+            posts = posts.filter(author__username=filters['author'])
+        backend = get_search_backend()
+        page_obj = paginate(
+            request, backend.search(query, posts),
+            ordering=backend.ordering, count_cap=settings.COUNT_CAP,
+        )
+    context = {
+        'query': query,
+        'filters': filters,
+        'groups': Group.objects.only('slug', 'title'),
+        'page_obj': page_obj,
+        'query_string': urlencode(
+            {'q': query, **{k: v for k, v in filters.items() if v}}
+        ),
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -119,16 +263,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    post = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post, settings.LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts, sources = timeline.feed(request.user)
+    page_obj = paginate(
+        request,
+        posts,
+        paginator_class=MergingCursorPaginator,
+        sources=sources,
+        count_cap=settings.COUNT_CAP,
+    )
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -138,9 +288,8 @@ def profile_follow(request, username):
     author_obj = get_object_or_404(User, username=username)
     user_obj = request.user
     if author_obj != user_obj:
-        Follow.objects.get_or_create(
-            user=user_obj, author=author_obj
-        )
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=user_obj, author=author_obj)
     return redirect('posts:profile', username=author_obj.username)
 
 
@@ -148,8 +297,14 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author_obj = get_object_or_404(User, username=username)
     user_obj = request.user
-    Follow.objects.filter(
-        user=user_obj,
-        author=author_obj
-    ).delete()
+    with transaction.atomic():
+        Follow.objects.filter(
+            user=user_obj,
+            author=author_obj
+        ).delete()
     return redirect('posts:profile', username=author_obj.username)
+
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(decorators.stats())
@@ -47,11 +47,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,7 +63,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.InstrumentedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,13 +84,53 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Транзакции начинаются с BEGIN IMMEDIATE (core.backends.sqlite3): чтение
+# и запись в одном atomic() ждут блокировку, а не падают с «locked».
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# Реплики только для чтения (core.routers): файлы SQLite через запятую в
+# YATUBE_DB_REPLICAS. Локально их обновляет manage.py sync_replicas; реплика
+# читается только после того, как отметила синхронизацию (mark_synced).
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только основную базу.
+REPLICA_PIN_SECONDS = 10
+
+# Применяются к каждому новому соединению SQLite (core.db).
+SQLITE_PRAGMAS = {
+    'busy_timeout': 10000,
+    'cache_size': -32000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+# WAL записывается в сам файл базы и остаётся в нём навсегда, поэтому
+# включается явно для рабочей базы (YATUBE_SQLITE_WAL=1), а db.sqlite3 из
+# репозитория остаётся с журналом отката.
+SQLITE_WAL_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+}
+if os.environ.get('YATUBE_SQLITE_WAL') == '1':
+    SQLITE_PRAGMAS.update(SQLITE_WAL_PRAGMAS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,15 +185,95 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 LIMIT = 10
 
+COMMENTS_LIMIT = 20
+
 TEXT_LIMIT = 15
 
+COUNT_CAP = 10000
+
+TIMELINE_BATCH_SIZE = 250
+
+TIMELINE_FANOUT_THRESHOLD = 1000
+
+# Сколько последних постов автора досыпается в ленты подписчиков при
+# подписке и при спаде автора ниже TIMELINE_FANOUT_THRESHOLD.
+TIMELINE_BACKFILL_POSTS = 100
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки сразу пишутся на диск и обрезаются после предела размера
+# (posts.uploads); больше предела и POST_IMAGE_MAX_PIXELS форма не примет,
+# а оригиналы больше POST_IMAGE_MAX_SIDE уменьшит. Не-JPEG декодируются
+# целиком, поэтому для них предел POST_IMAGE_MAX_DECODED_PIXELS.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedFileUploadHandler']
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_DECODED_PIXELS = 8 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 2560
+
+# Размеры миниатюр постов; генерируются в фоне (posts.thumbnails).
+POST_THUMBNAILS = {
+    'feed': '960x339',
+    'detail': '1200x1280',
+}
+
+# Потоков генерации миниатюр; 0 — генерировать сразу в запросе.
+THUMBNAIL_WORKERS = 2
+
+# Ширины и форматы копий картинок постов для srcset (posts.derivatives).
+# Копии шире оригинала не делаются; первый формат — основной, последний —
+# запасной для браузеров без его поддержки.
+POST_IMAGE_WIDTHS = (320, 640, 960, 1280)
+POST_IMAGE_FORMATS = ('webp', 'jpeg')
+POST_IMAGE_QUALITY = 80
+
+# Полнотекстовый поиск постов (posts.search). Для баз без FTS5 —
+# 'posts.search.SimpleSearchBackend'.
+POST_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+
+# Кеш общий для всех воркеров: версии лент (posts.feed_cache) должны
+# совпадать во всех процессах. Вместо каталога можно указать memcached на
+# локальном сокете: MemcachedCache с LOCATION 'unix:/tmp/memcached.sock'.
+# В нём страницы, фрагменты, записи sorl и версии областей (по ключу на
+# пост, группу и автора), так что MAX_ENTRIES по умолчанию (300) вытеснял
+# бы записи постоянно. Тесты получают свой кеш (core.test_runner).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.instrumentation.InstrumentedFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }
+
+TEST_RUNNER = 'core.test_runner.IsolatedCacheRunner'
+
+PAGE_CACHE_TIMEOUT = 300
+# Как часто процесс досылает в кеш счётчики попаданий кеша страниц.
+PAGE_CACHE_STATS_INTERVAL = 10
+
+# Замеры запросов (core.instrumentation): заголовок Server-Timing и лог
+# запросов дольше SLOW_REQUEST_MS с SLOW_REQUEST_SQL_LIMIT худшими SQL.
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SQL_LIMIT = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}